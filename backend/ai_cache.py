@@ -0,0 +1,205 @@
+import datetime
+import json
+import threading
+
+from cachetools import TTLCache
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from config import settings
+from database import AsyncSessionLocal
+
+
+def normalize_word(word: str) -> str:
+    """
+    Normalizes a word so that "Ubiquitous ", "ubiquitous" and "UBIQUITOUS"
+    all share one cache entry.
+    """
+    return " ".join(word.strip().lower().split())
+
+
+def make_key(variant: str, word: str) -> str:
+    """Builds a cache key from a prompt variant and a word."""
+    return f"{variant}:{normalize_word(word)}"
+
+
+class AIResponseCache:
+    """
+    A two-tier cache for AI responses.
+
+    1. An in-process LRU (with TTL) that answers repeat lookups in microseconds.
+    2. A table in the database that survives restarts and is shared by every
+       Gunicorn worker, so a word only ever costs one Gemini call.
+    """
+    # Run the (comparatively expensive) eviction query once every N writes.
+    PRUNE_EVERY = 100
+
+    def __init__(self, memory_size: int, ttl_seconds: int, max_rows: int, session_factory=AsyncSessionLocal):
+        self.ttl = datetime.timedelta(seconds=ttl_seconds)
+        self.max_rows = max_rows
+        self.session_factory = session_factory
+        self._memory = TTLCache(maxsize=memory_size, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.counters = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    async def get(self, key: str) -> dict | None:
+        """Looks a key up in memory first, then in the database."""
+        value = self._get_from_memory(key)
+        if value is not None:
+            return value
+
+        now = datetime.datetime.utcnow()
+        try:
+            async with self.session_factory() as db:
+                entry = await db.get(models.AICacheEntry, key)
+                if entry is not None and entry.expires_at > now:
+                    value = json.loads(entry.value)
+        except (SQLAlchemyError, ValueError) as e:
+            print(f"Error reading AI cache: {e}")
+            self._count("errors")
+
+        if value is None:
+            self._count("misses")
+            return None
+
+        # Promote to the memory tier so the next lookup skips the database.
+        with self._lock:
+            self._memory[key] = value
+        self._count("db_hits")
+        return value
+
+    async def get_many(self, keys: list[str]) -> dict[str, dict]:
+        """
+        Looks up several keys at once, using a single database query for
+        everything that missed the memory tier. Returns only the hits.
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._get_from_memory(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+
+        from_db = {}
+        now = datetime.datetime.utcnow()
+        try:
+            async with self.session_factory() as db:
+                result = await db.execute(select(models.AICacheEntry).where(
+                    models.AICacheEntry.key.in_(missing),
+                    models.AICacheEntry.expires_at > now,
+                ))
+                for entry in result.scalars():
+                    from_db[entry.key] = json.loads(entry.value)
+        except (SQLAlchemyError, ValueError) as e:
+            print(f"Error reading AI cache: {e}")
+            self._count("errors")
+
+        with self._lock:
+            self._memory.update(from_db)
+        self._count("db_hits", len(from_db))
+        self._count("misses", len(missing) - len(from_db))
+        found.update(from_db)
+        return found
+
+    def _get_from_memory(self, key: str) -> dict | None:
+        with self._lock:
+            value = self._memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+        return value
+
+    async def set(self, key: str, value: dict):
+        """Stores a value in both tiers."""
+        await self.set_many({key: value})
+
+    async def set_many(self, items: dict[str, dict]):
+        """Stores several values in both tiers, using a single transaction."""
+        if not items:
+            return
+        with self._lock:
+            self._memory.update(items)
+            self._writes_since_prune += len(items)
+            should_prune = self._writes_since_prune >= self.PRUNE_EVERY
+            if should_prune:
+                self._writes_since_prune = 0
+
+        now = datetime.datetime.utcnow()
+        try:
+            async with self.session_factory() as db:
+                # merge() is an upsert on the primary key, so two workers caching
+                # the same word just overwrite each other with equivalent data.
+                for key, value in items.items():
+                    await db.merge(models.AICacheEntry(
+                        key=key,
+                        value=json.dumps(value),
+                        created_at=now,
+                        expires_at=now + self.ttl,
+                    ))
+                await db.commit()
+                self._count("writes", len(items))
+                if should_prune:
+                    await self._prune(db, now)
+        except SQLAlchemyError as e:
+            print(f"Error writing AI cache: {e}")
+            self._count("errors")
+
+    async def _prune(self, db: AsyncSession, now: datetime.datetime):
+        """Deletes expired rows, then the oldest rows beyond max_rows."""
+        result = await db.execute(
+            delete(models.AICacheEntry).where(models.AICacheEntry.expires_at <= now)
+        )
+        deleted = result.rowcount
+
+        row_count = await db.scalar(select(func.count()).select_from(models.AICacheEntry))
+        overflow = row_count - self.max_rows
+        if overflow > 0:
+            oldest = select(models.AICacheEntry.key).order_by(
+                models.AICacheEntry.created_at
+            ).limit(overflow)
+            result = await db.execute(
+                delete(models.AICacheEntry).where(models.AICacheEntry.key.in_(oldest))
+            )
+            deleted += result.rowcount
+
+        await db.commit()
+        self._count("evictions", deleted)
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters and the current memory tier size."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_size"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear_memory(self):
+        """Empties the in-process tier (the database tier is left alone)."""
+        with self._lock:
+            self._memory.clear()
+
+
+# One cache per worker process; the database tier is what they share.
+cache = AIResponseCache(
+    memory_size=settings.ai_cache_memory_size,
+    ttl_seconds=settings.ai_cache_ttl_seconds,
+    max_rows=settings.ai_cache_max_rows,
+)
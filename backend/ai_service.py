@@ -1,15 +1,258 @@
-import google.generativeai as genai
 from config import settings
+from ai_cache import cache, make_key, normalize_word
+from circuit_breaker import CircuitBreaker, RetryBudget, backoff_delay
+from dictionary import dictionary
+from json_stream import IncrementalJSONObjectParser
+from pydantic import ValidationError
+import metrics
+import schemas
+import asyncio
+import contextlib
 import json
+import time
 
-# Configure the Gemini API client
-genai.configure(api_key=settings.google_api_key)
-model = genai.GenerativeModel('gemini-flash-latest')
+# The Gemini model. The SDK is slow to import, so it is only imported (and
+# the client configured) on the first AI call; see _get_model().
+model = None
+_model_lock = asyncio.Lock()
 
-def get_ai_word_details(word: str) -> dict:
+
+def _load_model():
+    import google.generativeai as genai
+
+    genai.configure(api_key=settings.google_api_key)
+    return genai.GenerativeModel('gemini-flash-latest')
+
+
+async def _get_model():
+    """Returns the Gemini model, importing the SDK in a thread on first use so the event loop keeps serving."""
+    global model
+    if model is None:
+        if not settings.google_api_key:
+            raise RuntimeError("GOOGLE_API_KEY is not set; AI features are unavailable.")
+        async with _model_lock:
+            if model is None:
+                model = await asyncio.to_thread(_load_model)
+    return model
+
+# --- Concurrency limits ---
+# Caps the number of Gemini calls in flight in this worker, so a burst of slow
+# AI requests queues here instead of piling up on the event loop.
+_semaphore = asyncio.Semaphore(settings.ai_max_concurrency)
+
+# Number of AI requests each user currently has in flight.
+# Key: user_id, Value: count
+_user_inflight: dict[int, int] = {}
+
+
+def try_acquire_user_slot(user_id: int) -> bool:
+    """
+    Reserves one in-flight AI request for a user.
+    Returns False if the user is already at the per-user cap.
+    """
+    current = _user_inflight.get(user_id, 0)
+    if current >= settings.ai_max_inflight_per_user:
+        return False
+    _user_inflight[user_id] = current + 1
+    return True
+
+
+def release_user_slot(user_id: int):
+    """Releases a slot reserved with try_acquire_user_slot()."""
+    remaining = _user_inflight.get(user_id, 0) - 1
+    if remaining > 0:
+        _user_inflight[user_id] = remaining
+    else:
+        _user_inflight.pop(user_id, None)
+
+
+# --- Failure handling ---
+# Stops calling Gemini while it keeps failing, so requests get their fallback
+# at once instead of each waiting out the timeout.
+breaker = CircuitBreaker(settings.ai_circuit_failure_threshold, settings.ai_circuit_reset_seconds)
+# Keeps retries to a small share of calls, so they cannot pile onto an outage.
+retry_budget = RetryBudget(settings.ai_retry_budget_ratio, settings.ai_retry_budget_min_per_second)
+
+
+def _outcome(error: BaseException) -> str:
+    return "timeout" if isinstance(error, asyncio.TimeoutError) else "error"
+
+
+@contextlib.asynccontextmanager
+async def _gemini_call(prompt: str, operation: str, stream: bool = False):
+    """
+    Calls Gemini and yields the response while holding a slot in the global
+    semaphore; the body should consume the response (read or stream it).
+
+    Raises CircuitOpenError right away while the circuit breaker is open.
+    A failed call is retried after a jittered backoff, as long as the retry
+    budget allows and the retry can still finish within the configured
+    timeout, which bounds all attempts together. Each failed attempt is
+    recorded under `operation` (see metrics.py); an exception raised in the
+    body counts as a failure too, except a ValueError (such as a JSON or
+    validation error): the reply could not be used, but Gemini did answer,
+    so it does not count towards opening the circuit.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.ai_timeout_seconds
+    gemini = await _get_model()
+    retry_budget.deposit()
+    attempt = 0
+    while True:
+        breaker.check()
+        async with _semaphore:
+            start = time.perf_counter()
+            try:
+                call = gemini.generate_content_async(prompt, stream=True) if stream else gemini.generate_content_async(prompt)
+                response = await asyncio.wait_for(call, timeout=max(0.0, deadline - loop.time()))
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                metrics.record_llm_call(operation, _outcome(e), time.perf_counter() - start)
+                error = e
+            else:
+                try:
+                    yield response
+                except ValueError:
+                    breaker.record_success()
+                    raise
+                except Exception:
+                    breaker.record_failure()
+                    raise
+                except BaseException:
+                    breaker.release()
+                    raise
+                breaker.record_success()
+                return
+
+        delay = backoff_delay(attempt, settings.ai_retry_base_delay_seconds, settings.ai_retry_max_delay_seconds)
+        if attempt >= settings.ai_max_retries or loop.time() + delay >= deadline or not retry_budget.try_withdraw():
+            raise error
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def _generate_json(prompt: str, operation: str) -> dict:
+    """
+    Sends a prompt to Gemini without blocking the event loop and parses the
+    JSON in the reply, through _gemini_call(). The call's latency (including
+    any retries), outcome and token usage are recorded under `operation`.
+    """
+    start = time.perf_counter()
+    async with _gemini_call(prompt, operation) as response:
+        text = response.text
+    elapsed = time.perf_counter() - start
+    usage = getattr(response, "usage_metadata", None)
+    # Clean up the response to extract the JSON part
+    json_response = text.strip().replace("```json", "").replace("```", "").strip()
+    try:
+        parsed = json.loads(json_response)
+    except ValueError:
+        metrics.record_llm_call(operation, "parse_error", elapsed, usage)
+        metrics.llm_parse_failures.inc(operation)
+        raise
+    metrics.record_llm_call(operation, "ok", elapsed, usage)
+    return parsed
+
+
+def _validate(data, schema, operation: str) -> dict:
+    """
+    Checks a Gemini reply against a response schema and returns it with only
+    the schema's fields. Raises ValidationError (counted as a parse failure
+    of `operation`) if it does not match, so a malformed reply is never cached.
+    """
+    try:
+        return schema.model_validate(data).model_dump()
+    except ValidationError:
+        metrics.llm_parse_failures.inc(operation)
+        raise
+
+
+def _cached(entry, schema) -> dict | None:
+    """A cache entry, or None (a miss) if it does not match the schema, e.g. one cached before replies were validated."""
+    if entry is None:
+        return None
+    try:
+        return schema.model_validate(entry).model_dump()
+    except ValidationError:
+        return None
+
+
+def _dictionary_fallback(word: str, fallback: dict) -> dict:
+    """
+    A copy of a canned fallback with the definition and example replaced by
+    the offline dictionary's, when it knows the word.
+    """
+    result = dict(fallback)
+    entry = dictionary.lookup(word)
+    if entry is not None:
+        definition, example = entry
+        if "definition" in result:
+            result["definition"] = definition
+        if example and "example" in result:
+            result["example"] = example
+    return result
+
+# --- Request coalescing (single-flight) ---
+# Upstream lookups currently in flight. Key: cache key, Value: the shared task.
+_inflight: dict[str, asyncio.Task] = {}
+
+coalescing_counters = {
+    "upstream_calls": 0,   # lookups that actually ran
+    "coalesced_calls": 0,  # lookups that piggybacked on one already running
+}
+
+
+def _forget_inflight(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Mark any exception as retrieved, in case every waiter was cancelled.
+    if not task.cancelled():
+        task.exception()
+
+
+async def _single_flight(key: str, fetch) -> dict:
+    """
+    Runs fetch() once per key, no matter how many callers ask concurrently.
+    Every caller gets the same result. The shared lookup runs in its own task,
+    so a caller disconnecting does not cancel it for everyone else.
+    """
+    task = _inflight.get(key)
+    if task is not None:
+        coalescing_counters["coalesced_calls"] += 1
+    else:
+        coalescing_counters["upstream_calls"] += 1
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget_inflight(key, t))
+    return await asyncio.shield(task)
+
+
+def stats() -> dict:
+    """Returns the cache, coalescing, circuit breaker and retry counters for this worker."""
+    return {
+        "cache": cache.stats(),
+        "coalescing": {**coalescing_counters, "in_flight": len(_inflight)},
+        "circuit": breaker.stats(),
+        "retries": retry_budget.stats(),
+    }
+
+async def get_ai_word_details(word: str) -> dict:
     """
     Uses the Gemini API to get a simple definition and example sentence for a word.
+    Results are cached, and concurrent requests for the same word share one
+    API call.
     """
+    cache_key = make_key("details", word)
+    return await _single_flight(cache_key, lambda: _fetch_ai_word_details(word, cache_key))
+
+async def _fetch_ai_word_details(word: str, cache_key: str) -> dict:
+    cached = _cached(await cache.get(cache_key), schemas.AIWordDetailResponse)
+    if cached is not None:
+        return cached
+
     prompt = f"""
     Provide a concise definition and a single, clear example sentence for the word '{word}'.
     Return the response as a JSON object with two keys: "definition" and "example".
@@ -20,22 +263,27 @@ def get_ai_word_details(word: str) -> dict:
     }}
     """
     try:
-        response = model.generate_content(prompt)
-        # Clean up the response to extract the JSON part
-        json_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_response)
+        details = _validate(await _generate_json(prompt, "details"), schemas.AIWordDetailResponse, "details")
+        # Only successful responses are cached; the fallback below never is.
+        await cache.set(cache_key, details)
+        return details
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
-        return {
-            "definition": "Could not fetch AI-powered definition.",
-            "example": "Please try again later."
-        }
+        return _dictionary_fallback(word, DETAILS_FALLBACK)
 
-def get_ai_word_explanation(word: str) -> dict:
-    """
-    Uses the Gemini API to get a definition, example, and a mnemonic for a word.
-    """
-    prompt = f"""
+DETAILS_FALLBACK = {
+    "definition": "Could not fetch AI-powered definition.",
+    "example": "Please try again later."
+}
+
+EXPLANATION_FALLBACK = {
+    "definition": "Could not fetch AI-powered definition.",
+    "example": "Please try again later.",
+    "mnemonic": "AI service is currently unavailable."
+}
+
+def _explanation_prompt(word: str) -> str:
+    return f"""
     Provide a concise definition, a clear example sentence, and a simple, easy-to-remember mnemonic for the word '{word}'.
     Return the response as a JSON object with three keys: "definition", "example", and "mnemonic".
     For example, for the word 'garrulous', the output should be:
@@ -45,25 +293,136 @@ def get_ai_word_explanation(word: str) -> dict:
       "mnemonic": "Imagine a GARgoyle that is always RULeS-ing the conversation by talking too much."
     }}
     """
+
+async def get_ai_word_explanation(word: str) -> dict:
+    """
+    Uses the Gemini API to get a definition, example, and a mnemonic for a word.
+    Results are cached, and concurrent requests for the same word share one
+    API call.
+    """
+    cache_key = make_key("explanation", word)
+    return await _single_flight(cache_key, lambda: _fetch_ai_word_explanation(word, cache_key))
+
+async def _fetch_ai_word_explanation(word: str, cache_key: str) -> dict:
+    cached = _cached(await cache.get(cache_key), schemas.AIWordExplanation)
+    if cached is not None:
+        return cached
+
     try:
-        response = model.generate_content(prompt)
-        # Clean up the response to extract the JSON part
-        json_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_response)
+        explanation = _validate(
+            await _generate_json(_explanation_prompt(word), "explanation"), schemas.AIWordExplanation, "explanation"
+        )
+        await cache.set(cache_key, explanation)
+        return explanation
     except Exception as e:
         print(f"Error calling Gemini API for explanation: {e}")
-        return {
-            "definition": "Could not fetch AI-powered definition.",
-            "example": "Please try again later.",
-            "mnemonic": "AI service is currently unavailable."
-        }
+        return _dictionary_fallback(word, EXPLANATION_FALLBACK)
     
-def get_alternative_explanation(word: str, previous_example: str, previous_mnemonic: str) -> dict:
+async def get_ai_word_explanations(words: list[str]) -> tuple[dict[str, dict], list[str]]:
     """
-    Uses the Gemini API to generate a NEW example and mnemonic for a word,
-    given the previous ones to avoid repetition.
+    Explains many words at once. Cached words are answered from the cache;
+    the rest are packed into multi-word prompts that return a JSON array.
+    Words that come back missing or malformed are retried on their own,
+    unless the circuit breaker has opened.
+
+    Returns a dict keyed by normalized word, and the words Gemini could not
+    explain, which get the same fallback as get_ai_word_explanation().
     """
+    # Normalize and dedupe, keeping the caller's order.
+    normalized = list(dict.fromkeys(w for w in (normalize_word(word) for word in words) if w))
+    results: dict[str, dict] = {}
+
+    cached = await cache.get_many([make_key("explanation", word) for word in normalized])
+    pending = []
+    for word in normalized:
+        hit = _cached(cached.get(make_key("explanation", word)), schemas.AIWordExplanation)
+        if hit is not None:
+            results[word] = hit
+        else:
+            pending.append(word)
+
+    for _ in range(1 + settings.ai_batch_max_retries):
+        if not pending:
+            break
+        chunks = [
+            pending[i:i + settings.ai_batch_chunk_size]
+            for i in range(0, len(pending), settings.ai_batch_chunk_size)
+        ]
+        # The global semaphore bounds how many of these run at once.
+        chunk_results = await asyncio.gather(*(_explain_chunk(chunk) for chunk in chunks))
+
+        explained = {}
+        for chunk_result in chunk_results:
+            explained.update(chunk_result)
+        await cache.set_many({make_key("explanation", word): item for word, item in explained.items()})
+        results.update(explained)
+        pending = [word for word in pending if word not in explained]
+        # Gemini is down: retrying would only use up the retry budget.
+        if breaker.state == breaker.OPEN:
+            break
+
+    for word in pending:
+        results[word] = _dictionary_fallback(word, EXPLANATION_FALLBACK)
+    return {word: results[word] for word in normalized}, pending
+
+async def _explain_chunk(words: list[str]) -> dict[str, dict]:
+    """
+    Asks Gemini to explain a chunk of words in a single call.
+    Returns only the items that passed validation, keyed by normalized word.
+    """
+    word_list = ", ".join(f"'{word}'" for word in words)
     prompt = f"""
+    For each of the following words, provide a concise definition, a clear example sentence, and a simple, easy-to-remember mnemonic: {word_list}.
+    Return the response as a JSON array with one object per word. Each object must have four keys: "word", "definition", "example", and "mnemonic".
+    For example, for the words 'garrulous' and 'ephemeral', the output should be:
+    [
+      {{
+        "word": "garrulous",
+        "definition": "Excessively talkative, especially on trivial matters.",
+        "example": "The garrulous man held up the checkout line while telling the cashier his life story.",
+        "mnemonic": "Imagine a GARgoyle that is always RULeS-ing the conversation by talking too much."
+      }},
+      {{
+        "word": "ephemeral",
+        "definition": "Lasting for a very short time.",
+        "example": "The beauty of the cherry blossoms is ephemeral, enjoyed for only a few weeks each year.",
+        "mnemonic": "EPHEMERAL sounds like 'a FEW MERE ALL-day' moments: gone before you know it."
+      }}
+    ]
+    """
+    try:
+        items = await _generate_json(prompt, "batch_explanation")
+    except Exception as e:
+        print(f"Error calling Gemini API for batch explanation: {e}")
+        return {}
+    if not isinstance(items, list):
+        print("Gemini API returned a non-list response for batch explanation")
+        metrics.llm_parse_failures.inc("batch_explanation")
+        return {}
+
+    requested = set(words)
+    explained = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        word = normalize_word(str(item.get("word", "")))
+        if word not in requested:
+            continue
+        try:
+            explanation = schemas.AIWordExplanation.model_validate(item)
+        except ValidationError:
+            metrics.llm_parse_failures.inc("batch_explanation")
+            continue
+        explained[word] = explanation.model_dump()
+    return explained
+
+ALTERNATIVE_FALLBACK = {
+    "example": "Sorry, I couldn't think of another example right now.",
+    "mnemonic": "Please try adding the word and reviewing it later."
+}
+
+def _alternative_prompt(word: str, previous_example: str, previous_mnemonic: str) -> str:
+    return f"""
     A user is trying to understand the word '{word}'.
     They were already shown this example: "{previous_example}"
     And this mnemonic: "{previous_mnemonic}"
@@ -71,18 +430,122 @@ def get_alternative_explanation(word: str, previous_example: str, previous_mnemo
     Please provide a completely different, simpler example sentence and a new, creative mnemonic to help them understand.
     Return the response as a JSON object with two keys: "example" and "mnemonic".
     """
+
+def _alternative_fallback(word: str, previous_example: str) -> dict:
+    """The canned fallback, with the offline dictionary's example if it is not the one already shown."""
+    fallback = _dictionary_fallback(word, ALTERNATIVE_FALLBACK)
+    if fallback["example"] == previous_example:
+        fallback["example"] = ALTERNATIVE_FALLBACK["example"]
+    return fallback
+
+async def get_alternative_explanation(word: str, previous_example: str, previous_mnemonic: str) -> dict:
+    """
+    Uses the Gemini API to generate a NEW example and mnemonic for a word,
+    given the previous ones to avoid repetition.
+    """
     try:
-        response = model.generate_content(prompt)
-        json_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_response)
+        return _validate(
+            await _generate_json(_alternative_prompt(word, previous_example, previous_mnemonic), "alternative"),
+            schemas.AIRegenerateResponse,
+            "alternative",
+        )
     except Exception as e:
         print(f"Error calling Gemini API for alternative explanation: {e}")
-        return {
-            "example": "Sorry, I couldn't think of another example right now.",
-            "mnemonic": "Please try adding the word and reviewing it later."
-        }
+        return _alternative_fallback(word, previous_example)
+
+# --- Streaming ---
+async def _stream_json_fields(prompt: str, operation: str):
+    """
+    Streams a Gemini response and yields (field, value) pairs from the JSON
+    object in it as soon as each value is complete. The whole stream must
+    finish within the configured timeout. The stream's duration and outcome
+    are recorded under `operation`, like _generate_json() does.
+    """
+    parser = IncrementalJSONObjectParser()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.ai_timeout_seconds
+    start = time.perf_counter()
+    outcome = "ok"
+    usage = None
+    async with _gemini_call(prompt, operation, stream=True) as response:
+        try:
+            chunks = response.__aiter__()
+            while not parser.done:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    # The stream ended before the JSON object did.
+                    outcome = "parse_error"
+                    metrics.llm_parse_failures.inc(operation)
+                    break
+                # The final chunk carries the usage of the whole response.
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                for field in parser.feed(chunk.text):
+                    yield field
+        except ValueError:
+            outcome = "parse_error"
+            metrics.llm_parse_failures.inc(operation)
+            raise
+        except Exception as e:
+            outcome = _outcome(e)
+            raise
+        finally:
+            metrics.record_llm_call(operation, outcome, time.perf_counter() - start, usage)
+
+async def _stream_with_fallback(prompt: str, fallback: dict, operation: str, error_label: str):
+    """
+    Yields the expected fields as they stream in. If the stream fails or
+    ends early, the fields that never arrived are filled from the fallback,
+    so callers always receive every field exactly once.
+    """
+    received = {}
+    try:
+        async for field, value in _stream_json_fields(prompt, operation):
+            if field in fallback and field not in received and isinstance(value, str):
+                received[field] = value
+                yield field, value
+    except Exception as e:
+        print(f"Error streaming Gemini API response for {error_label}: {e}")
+    for field, value in fallback.items():
+        if field not in received:
+            yield field, value
+
+async def stream_ai_word_explanation(word: str):
+    """
+    Streaming version of get_ai_word_explanation(). Yields (field, value)
+    pairs: the definition as soon as Gemini has produced it, then the
+    example, then the mnemonic. A complete explanation is cached.
+    """
+    cache_key = make_key("explanation", word)
+    cached = _cached(await cache.get(cache_key), schemas.AIWordExplanation)
+    if cached is not None:
+        for field in EXPLANATION_FALLBACK:
+            yield field, cached[field]
+        return
+
+    explanation = {}
+    fallback = _dictionary_fallback(word, EXPLANATION_FALLBACK)
+    async for field, value in _stream_with_fallback(
+        _explanation_prompt(word), fallback, "explanation_stream", "explanation"
+    ):
+        explanation[field] = value
+        yield field, value
+    # Only cache explanations where no field had to fall back.
+    if all(explanation[field] != fallback[field] for field in fallback):
+        await cache.set(cache_key, explanation)
+
+async def stream_alternative_explanation(word: str, previous_example: str, previous_mnemonic: str):
+    """
+    Streaming version of get_alternative_explanation(). Yields (field, value)
+    pairs: the example first, then the mnemonic.
+    """
+    prompt = _alternative_prompt(word, previous_example, previous_mnemonic)
+    async for field, value in _stream_with_fallback(
+        prompt, _alternative_fallback(word, previous_example), "alternative_stream", "alternative explanation"
+    ):
+        yield field, value
     
-def get_ai_word_suggestions(existing_words: list[str] = None) -> dict:
+async def get_ai_word_suggestions(existing_words: list[str] = None) -> dict:
     """
     Uses the Gemini API to suggest new vocabulary words.
     """
@@ -110,9 +573,7 @@ def get_ai_word_suggestions(existing_words: list[str] = None) -> dict:
         }}
         """
     try:
-        response = model.generate_content(prompt)
-        json_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_response)
+        return await _generate_json(prompt, "suggestions")
     except Exception as e:
         print(f"Error calling Gemini API for suggestions: {e}")
         return {"suggestions": []}
\ No newline at end of file
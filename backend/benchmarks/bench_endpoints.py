@@ -0,0 +1,178 @@
+"""
+Measures throughput and latency of the cheap CRUD endpoints (/words/ and
+/review/next/) against a real Uvicorn server and a freshly seeded SQLite
+database.
+
+To compare two versions of the backend, check the older one out into a
+worktree and run the benchmark against both:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/bench_endpoints.py --app-dir /tmp/before/backend --output before.json
+    python benchmarks/bench_endpoints.py --output after.json
+
+Run from the backend directory. Needs the packages in requirements.txt.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from passlib.context import CryptContext
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERNAME = "bench-user"
+PASSWORD = "bench-password"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision(path: str) -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed(db_path: str, words: int):
+    """Inserts one user with `words` words, all due today, straight into SQLite."""
+    hashed_password = CryptContext(schemes=["bcrypt"]).hash(PASSWORD)
+    today = datetime.date.today().isoformat()
+    conn = sqlite3.connect(db_path)
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO users (username, hashed_password) VALUES (?, ?)", (USERNAME, hashed_password)
+        )
+        user_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO words (text, definition, difficulty, next_review_due, owner_id) VALUES (?, ?, ?, ?, ?)",
+            ((f"word{i}", f"definition of word {i}", 1 + i % 10, today, user_id) for i in range(words)),
+        )
+    conn.close()
+
+
+async def wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout} seconds")
+
+
+async def run_endpoint(client: httpx.AsyncClient, path: str, requests: int, concurrency: int, ok_statuses: set) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+            except httpx.HTTPError:
+                # e.g. a timeout while the server waits for a pooled connection
+                response = None
+            latencies.append(time.perf_counter() - start)
+            if response is None or response.status_code not in ok_statuses:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+async def benchmark(base_url: str, requests: int, concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        response = await client.post("/token", data={"username": USERNAME, "password": PASSWORD})
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        results = {}
+        # Warm up connections and caches before measuring.
+        await run_endpoint(client, "/words/", min(requests, 50), concurrency, {200})
+        results["/words/"] = await run_endpoint(client, "/words/", requests, concurrency, {200})
+        # 404 just means today's queue ran out, which is a valid (and cheap) answer.
+        results["/review/next/"] = await run_endpoint(client, "/review/next/", requests, concurrency, {200, 404})
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="backend directory to benchmark")
+    parser.add_argument("--words", type=int, default=2000, help="words seeded for the benchmark user")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent client connections")
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn worker processes")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Versions without a DATABASE_URL setting always use ./sql_app.db, so
+        # the server runs in the temporary directory and both end up here.
+        db_path = os.path.join(tmp, "sql_app.db")
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{db_path}",
+            GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "benchmark-placeholder"),
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.abspath(args.app_dir),
+             "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=tmp,
+            env=env,
+        )
+        try:
+            asyncio.run(wait_until_up(base_url))
+            seed(db_path, args.words)
+            results = asyncio.run(benchmark(base_url, args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "app_dir": os.path.abspath(args.app_dir),
+        "revision": git_revision(args.app_dir),
+        "words": args.words,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "endpoints": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
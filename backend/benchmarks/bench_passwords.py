@@ -0,0 +1,132 @@
+"""
+Measures how many password verifications (logins) per second the hashing
+pool in security.py sustains, for different numbers of hashing processes,
+and how many logins per second that is per core. While the pool is busy it
+also times a trivial coroutine on the same event loop, to show that other
+requests are not held up behind bcrypt.
+
+    python benchmarks/bench_passwords.py --rounds 12 --output passwords.json
+
+Run from the backend directory. --rounds defaults to BCRYPT_ROUNDS (or the
+configured default), so pass the production cost factor when it differs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+import security  # noqa: E402
+from config import settings  # noqa: E402
+
+
+async def measure_loop_latency(stop: asyncio.Event) -> list[float]:
+    """Event-loop lag: how late a 10 ms sleep wakes up, sampled until stopped."""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+    return lags
+
+
+async def run(processes: int, logins: int, concurrency: int, hashed: str) -> dict:
+    settings.password_hash_processes = processes
+    # Queue room for every client, so nothing is shed while measuring throughput.
+    settings.password_hash_max_queue = concurrency
+    security.shutdown_pool()
+    await asyncio.gather(*(security.verify_password_async("password", hashed) for _ in range(processes)))  # warm up
+
+    remaining = logins
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            valid, _ = await security.verify_password_async("password", hashed)
+            assert valid
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_latency(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = await lag_task
+
+    return {
+        "logins_per_second": logins / elapsed,
+        "logins_per_second_per_process": logins / elapsed / processes,
+        "event_loop_lag_p99_ms": statistics.quantiles(lags, n=100)[98] * 1000 if len(lags) > 1 else None,
+    }
+
+
+async def measure_shedding(concurrency: int, hashed: str) -> dict:
+    """Fires more logins at once than the pool admits and counts the 503s."""
+    settings.password_hash_processes = 1
+    settings.password_hash_max_queue = 4
+    security.shutdown_pool()
+
+    async def login():
+        try:
+            await security.verify_password_async("password", hashed)
+            return True
+        except security.PasswordHashingBusy:
+            return False
+
+    results = await asyncio.gather(*(login() for _ in range(concurrency)))
+    return {"attempted": concurrency, "admitted": sum(results), "rejected": results.count(False)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=settings.bcrypt_rounds, help="bcrypt cost factor")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument("--logins", type=int, default=100, help="logins per measurement")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    # The hashing processes are spawned, and read their settings from the environment.
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    context = security.pwd_context.copy(
+        bcrypt__default_rounds=args.rounds, bcrypt__min_rounds=args.rounds, bcrypt__max_rounds=args.rounds
+    )
+    hashed = context.hash("password")
+
+    # Baseline: one verification at a time in this process, as /token used to do.
+    start = time.perf_counter()
+    for _ in range(min(args.logins, 20)):
+        context.verify("password", hashed)
+    inline = min(args.logins, 20) / (time.perf_counter() - start)
+
+    async def run_all():
+        pool = {}
+        for processes in sorted(set(args.processes)):
+            pool[str(processes)] = await run(processes, args.logins, args.concurrency, hashed)
+        shedding = await measure_shedding(args.concurrency, hashed)
+        security.shutdown_pool()
+        return pool, shedding
+
+    pool, shedding = asyncio.run(run_all())
+    report = {
+        "rounds": args.rounds,
+        "cpus": os.cpu_count(),
+        "inline_logins_per_second": inline,
+        "pool": pool,
+        "shedding": shedding,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Measures how many cards per second the SRS engine (srs.py) can review and
+reschedule, for every algorithm, on randomly generated decks held in NumPy
+arrays. For reference it also times the original one-card-at-a-time Python
+scheduling rule on the same answers.
+
+    python benchmarks/bench_srs.py --cards 1000000 --output srs.json
+
+Run from the backend directory. Needs numpy.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import srs  # noqa: E402
+
+
+def random_deck(cards: int, rng: np.random.Generator) -> srs.DeckState:
+    """A deck of cards that have each been reviewed a few times already."""
+    reviews = rng.integers(1, 30, cards)
+    return srs.DeckState(
+        difficulty=rng.integers(1, 11, cards),
+        interval_days=rng.integers(1, 120, cards),
+        ease_factor=rng.uniform(1.3, 3.0, cards),
+        repetitions=rng.integers(0, 10, cards),
+        stability=rng.uniform(0.5, 200.0, cards),
+        reviews=reviews,
+        lapses=rng.integers(0, 5, cards) % reviews,
+        elapsed_days=rng.uniform(0.0, 120.0, cards),
+    )
+
+
+def python_loop(difficulty: np.ndarray, correct: np.ndarray, today: datetime.date) -> float:
+    """The scheduling rule the backend used before srs.py, one card at a time."""
+    start = time.perf_counter()
+    for d, was_correct in zip(difficulty.tolist(), correct.tolist()):
+        if was_correct:
+            interval_days = 2 ** (8 - d)
+            if d > 1:
+                d -= 1
+        else:
+            interval_days = 1
+            if d < 10:
+                d += 1
+        today + datetime.timedelta(days=interval_days)
+    return time.perf_counter() - start
+
+
+def best_of(repeats: int, func) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=1_000_000, help="cards per deck")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per measurement (the best one is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    deck = random_deck(args.cards, rng)
+    correct = rng.random(args.cards) < 0.85
+    params = srs.SRSParams()
+
+    results = {}
+    for algorithm in sorted(srs.ALGORITHMS):
+        review_seconds = best_of(args.repeats, lambda: srs.review(algorithm, deck, correct, params))
+        reschedule_seconds = best_of(args.repeats, lambda: srs.reschedule_intervals(algorithm, deck, params))
+        results[algorithm] = {
+            "review_cards_per_second": args.cards / review_seconds,
+            "reschedule_cards_per_second": args.cards / reschedule_seconds,
+        }
+
+    loop_seconds = python_loop(deck.difficulty, correct, datetime.date.today())
+    results["python_loop"] = {"review_cards_per_second": args.cards / loop_seconds}
+
+    report = {"cards": args.cards, "numpy": np.__version__, "algorithms": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
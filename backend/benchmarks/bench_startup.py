@@ -0,0 +1,159 @@
+"""
+Measures cold-start cost: how long `import main` takes in a fresh
+interpreter, and how long a new Uvicorn server takes from launch to its
+first successful response. Every run starts a new process against a new
+SQLite database, so nothing is warm except the OS file cache.
+
+To compare two versions of the backend, check the older one out into a
+worktree and run the benchmark against both:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/bench_startup.py --app-dir /tmp/before/backend --output before.json
+    python benchmarks/bench_startup.py --baseline before.json --output after.json
+
+Run from the backend directory. Needs the packages in requirements.txt.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child: times the import and reports which heavy SDKs it pulled in.
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_seconds": elapsed,
+    "modules": len(sys.modules),
+    "gemini_sdk_imported": "google.generativeai" in sys.modules,
+}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision(path: str) -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_env(tmp: str, run: int) -> dict:
+    return dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, f'startup-{run}.db')}",
+        # Older versions refuse to start without a key; this one never uses it here.
+        GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "benchmark-placeholder"),
+        PYTHONWARNINGS="ignore",
+    )
+
+
+def measure_import(app_dir: str, env: dict) -> dict:
+    """Imports main in a fresh interpreter; also times the whole process, interpreter start included."""
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE], cwd=app_dir, env=env, text=True,
+                                     stderr=subprocess.DEVNULL)
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_seconds"] = time.perf_counter() - start
+    return result
+
+
+def measure_first_response(app_dir: str, env: dict, timeout: float = 60.0) -> float:
+    """Seconds from launching a Uvicorn server until GET / first answers 200."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if client.get("/").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with status {server.returncode} before answering")
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+    raise RuntimeError(f"Server did not answer within {timeout} seconds")
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Ratios of this run's medians to the baseline's (<1 means faster)."""
+    comparison = {}
+    for key in ("import_seconds", "process_seconds", "first_response_seconds"):
+        before = baseline.get(key, {}).get("median")
+        if before:
+            comparison[key] = round(report[key]["median"] / before, 3)
+    return {"baseline_revision": baseline.get("revision"), "median_ratios": comparison}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="backend directory to benchmark")
+    parser.add_argument("--runs", type=int, default=7, help="cold starts measured for each number")
+    parser.add_argument("--baseline", help="an earlier --output file to compare against")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+    app_dir = os.path.abspath(args.app_dir)
+
+    imports, first_responses = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            imports.append(measure_import(app_dir, make_env(tmp, run)))
+        for run in range(args.runs):
+            first_responses.append(measure_first_response(app_dir, make_env(tmp, args.runs + run)))
+
+    report = {
+        "app_dir": app_dir,
+        "revision": git_revision(app_dir),
+        "runs": args.runs,
+        "import_seconds": summarize([r["import_seconds"] for r in imports]),
+        "process_seconds": summarize([r["process_seconds"] for r in imports]),
+        "first_response_seconds": summarize(first_responses),
+        "modules_loaded": imports[-1]["modules"],
+        "gemini_sdk_imported": imports[-1]["gemini_sdk_imported"],
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
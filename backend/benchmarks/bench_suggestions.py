@@ -0,0 +1,81 @@
+"""
+Measures the latency of word suggestions from the local embedding index
+(word_index.py) for users with vocabularies of different sizes.
+
+Uses data/word_vectors.npy if it has been built; otherwise random unit
+vectors of the same shape stand in for it, which costs exactly the same to
+search.
+
+    python benchmarks/bench_suggestions.py --output suggestions.json
+
+Run from the backend directory. Needs numpy.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+import word_index  # noqa: E402
+
+
+def random_vectors(path: str, rows: int, dimensions: int, rng: np.random.Generator):
+    vectors = rng.standard_normal((rows, dimensions), dtype=np.float32)
+    np.save(path, vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocabulary-sizes", type=int, nargs="+", default=[0, 10, 1000, 10000, 50000])
+    parser.add_argument("--requests", type=int, default=1000, help="suggestion requests per vocabulary size")
+    parser.add_argument("--dimensions", type=int, default=256, help="dimensions of the stand-in vectors")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with open(word_index.WORDS_PATH) as f:
+        words = [line.strip() for line in f if line.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vectors_path = word_index.VECTORS_PATH
+        synthetic = not os.path.exists(vectors_path)
+        if synthetic:
+            vectors_path = os.path.join(tmp, "word_vectors.npy")
+            random_vectors(vectors_path, len(words), args.dimensions, rng)
+        index = word_index.WordEmbeddingIndex(word_index.WORDS_PATH, vectors_path, skip_common=2000, candidates=50)
+
+        results = {}
+        for size in args.vocabulary_sizes:
+            # Real vocabularies also contain words (and phrases) the index does not know.
+            in_index = min(size, len(words) // 2)
+            known = list(rng.choice(words, size=in_index, replace=False)) + [f"unknown{i}" for i in range(size - in_index)]
+            index.suggest(known, 5, rng)  # warm up (and open the memory map)
+            latencies = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                index.suggest(known, 5, rng)
+                latencies.append(time.perf_counter() - start)
+            quantiles = statistics.quantiles(latencies, n=100)
+            results[str(size)] = {
+                "p50_ms": quantiles[49] * 1000,
+                "p95_ms": quantiles[94] * 1000,
+                "p99_ms": quantiles[98] * 1000,
+            }
+
+    report = {"words": len(words), "synthetic_vectors": synthetic, "vocabulary_sizes": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
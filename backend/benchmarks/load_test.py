@@ -0,0 +1,467 @@
+"""
+Load test for the whole API with Gemini replaced by a local stand-in.
+
+Starts the app in a Uvicorn server whose google.generativeai.GenerativeModel
+is a fake with configurable latency and failure rate, seeds its database
+with N users x M words, and then drives realistic traffic mixes (logging
+in, adding words, the review loop, suggestions, ...) from many concurrent
+virtual users. Reports throughput and p50/p95/p99 latency per endpoint.
+
+Everything random is seeded, so two runs with the same arguments send the
+same requests and get the same fake Gemini behaviour. To compare two
+versions of the backend, check the older one out into a worktree:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/load_test.py --app-dir /tmp/before/backend --output before.json
+    python benchmarks/load_test.py --baseline before.json --output after.json
+
+Run from the backend directory. Needs the packages in requirements.txt.
+The server runs a single worker, because the fake model is patched into
+that process.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS_PATH = os.path.join(BACKEND_DIR, "data", "words.txt")
+PASSWORD = "load-password"
+
+# Relative weights of the actions each virtual user picks from.
+MIXES = {
+    # Daily practice: mostly the review loop.
+    "study": {"review": 70, "list_words": 10, "add_word": 10, "explain": 5, "suggestions": 5},
+    # Looking around the vocabulary.
+    "browse": {"list_words": 40, "search": 30, "suggestions": 15, "explain": 15},
+    # New and returning users building up their vocabulary.
+    "onboarding": {"login": 30, "add_word": 40, "suggestions": 20, "explain": 10},
+    # A bit of everything, roughly what production sees.
+    "mixed": {"login": 5, "review": 45, "add_word": 15, "suggestions": 10, "list_words": 10, "search": 10, "explain": 5},
+}
+
+
+def load_words() -> list[str]:
+    with open(WORDS_PATH) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision(path: str) -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Server side ---
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStream:
+    """Yields a reply in small chunks, spreading the latency across them like a real stream."""
+    def __init__(self, text: str, delay: float):
+        self.chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        self.delay = delay / max(1, len(self.chunks))
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield FakeResponse(chunk)
+
+
+class FakeGenerativeModel:
+    """
+    Stands in for google.generativeai.GenerativeModel. Recognises the
+    prompts ai_service sends and answers them with well-formed JSON after
+    `latency_ms` (plus up to `jitter_ms`), or raises with probability
+    `failure_rate`, like a failed or timed-out API call.
+
+    The random draws of a call depend only on the seed, the prompt and how
+    often that prompt was sent before, not on the order in which concurrent
+    calls arrive, so a rerun sees the same delays and failures.
+    """
+    def __init__(self, model_name: str, *, latency_ms: float, jitter_ms: float, failure_rate: float, seed: int,
+                 words: list[str]):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.words = words
+        self.calls = 0
+        self.failures = 0
+        self.sent: dict[str, int] = {}
+
+    def _rng(self, prompt: str) -> random.Random:
+        """A generator for one call; str seeds are hashed the same way in every process."""
+        repeat = self.sent.get(prompt, 0)
+        self.sent[prompt] = repeat + 1
+        return random.Random(f"{self.seed}:{repeat}:{prompt}")
+
+    def _reply(self, prompt: str, rng: random.Random) -> str:
+        words = re.findall(r"'([^']+)'", prompt)
+        word = words[0] if words else "word"
+        if "JSON array" in prompt:
+            requested = re.findall(r"'([^']+)'", prompt.split("mnemonic:", 1)[1].split("\n", 1)[0])
+            return json.dumps([
+                {"word": w, "definition": f"Meaning of {w}.", "example": f"An example with {w}.",
+                 "mnemonic": f"Remember {w}."}
+                for w in requested
+            ])
+        if '"suggestions"' in prompt:
+            return json.dumps({"suggestions": rng.sample(self.words, 5)})
+        if '"definition"' not in prompt:
+            return json.dumps({"example": f"Another example with {word}.", "mnemonic": f"Think of {word}."})
+        reply = {"definition": f"Meaning of {word}.", "example": f"An example with {word}."}
+        if '"mnemonic"' in prompt:
+            reply["mnemonic"] = f"Remember {word}."
+        return "```json\n" + json.dumps(reply) + "\n```"
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        rng = self._rng(prompt)
+        delay = (self.latency_ms + rng.uniform(0, self.jitter_ms)) / 1000
+        if rng.random() < self.failure_rate:
+            self.failures += 1
+            await asyncio.sleep(delay)
+            raise RuntimeError("Simulated Gemini failure")
+        if stream:
+            return FakeStream(self._reply(prompt, rng), delay)
+        await asyncio.sleep(delay)
+        return FakeResponse(self._reply(prompt, rng))
+
+
+def seed_database(users: int, words_per_user: int, words: list[str], seed: int):
+    """
+    Inserts `users` users, all with PASSWORD, and `words_per_user` words
+    each, with due dates spread from a month ago to two months ahead.
+    """
+    from sqlalchemy import insert
+
+    import models
+    import security
+    from database import engine
+
+    try:
+        from word_search import normalize_text
+    except ImportError:  # versions before normalized_text existed
+        normalize_text = str.casefold
+
+    rng = random.Random(seed)
+    hashed_password = security.get_password_hash(PASSWORD)
+    today = datetime.date.today()
+    columns = set(models.Word.__table__.c.keys())
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"username": f"load-user-{i}", "hashed_password": hashed_password} for i in range(users)
+        ])
+        user_ids = [row.id for row in conn.execute(models.User.__table__.select().order_by(models.User.id))]
+        for user_id in user_ids:
+            texts = rng.sample(words, min(words_per_user, len(words)))
+            texts += [f"{rng.choice(words)}{i}" for i in range(words_per_user - len(texts))]
+            rows = []
+            for text in texts:
+                row = {
+                    "text": text,
+                    "normalized_text": normalize_text(text),
+                    "definition": f"Meaning of {text}.",
+                    "difficulty": rng.randint(1, 10),
+                    "next_review_due": today + datetime.timedelta(days=rng.randint(-30, 60)),
+                    "owner_id": user_id,
+                }
+                # Older versions of the schema may lack some columns.
+                rows.append({key: value for key, value in row.items() if key in columns})
+            conn.execute(insert(models.Word), rows)
+
+
+def serve(args):
+    """Runs the app with the fake model until terminated (the --serve mode)."""
+    sys.path.insert(0, args.app_dir)
+    os.chdir(args.app_dir)
+    words = load_words()
+
+    import google.generativeai as genai
+
+    def make_model(model_name, *_, **__):
+        return FakeGenerativeModel(
+            model_name, latency_ms=args.gemini_latency_ms, jitter_ms=args.gemini_jitter_ms,
+            failure_rate=args.gemini_failure_rate, seed=args.seed, words=words,
+        )
+
+    genai.GenerativeModel = make_model
+
+    import uvicorn
+
+    import main
+
+    try:
+        import migrate
+        migrate.create_schema()
+    except ImportError:  # versions before migrate.py create the schema when main is imported
+        pass
+    seed_database(args.users, args.words, words, args.seed)
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- Client side ---
+
+class Recorder:
+    """Latencies and status codes per endpoint."""
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.statuses: dict[str, dict[str, int]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, endpoint: str, seconds: float, status_code: int, ok: bool):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        statuses = self.statuses.setdefault(endpoint, {})
+        statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+        self.errors[endpoint] = self.errors.get(endpoint, 0) + (not ok)
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0]] * 99
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": self.errors[endpoint],
+                "statuses": self.statuses[endpoint],
+                "requests_per_second": len(latencies) / elapsed,
+                "p50_ms": quantiles[49] * 1000,
+                "p95_ms": quantiles[94] * 1000,
+                "p99_ms": quantiles[98] * 1000,
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "seconds": elapsed,
+            "requests_per_second": total / elapsed,
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    """One simulated client, signed in as one of the seeded users."""
+    def __init__(self, number: int, username: str, client: httpx.AsyncClient, recorder: Recorder,
+                 words: list[str], seed: int):
+        self.number = number
+        self.username = username
+        self.client = client
+        self.recorder = recorder
+        self.words = words
+        self.rng = random.Random(seed)
+        self.headers: dict[str, str] = {}
+        self.added = 0
+
+    async def request(self, endpoint: str, method: str, path: str, ok_statuses: set, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        self.recorder.record(endpoint, time.perf_counter() - start, response.status_code,
+                             response.status_code in ok_statuses)
+        return response
+
+    async def login(self):
+        response = await self.request("POST /token", "POST", "/token", {200},
+                                      data={"username": self.username, "password": PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def add_word(self):
+        self.added += 1
+        text = f"{self.rng.choice(self.words)} {self.number}-{self.added}"
+        # 409 means the word was already in the vocabulary, which is a valid answer.
+        await self.request("POST /words/", "POST", "/words/", {201, 409},
+                           json={"text": text, "definition": f"Meaning of {text}."})
+
+    async def review(self):
+        # Drawn whatever the answer, so the user's later draws do not depend on it.
+        was_correct = self.rng.random() < 0.8
+        # 404 just means the user's queue ran out, which is a valid answer.
+        response = await self.request("GET /review/next/", "GET", "/review/next/", {200, 404})
+        if response.status_code == 200:
+            word_id = response.json()["id"]
+            await self.request("POST /review/{word_id}", "POST", f"/review/{word_id}", {200},
+                               json={"was_correct": was_correct})
+
+    async def suggestions(self):
+        await self.request("GET /ai/suggest-words/", "GET", "/ai/suggest-words/", {200})
+
+    async def list_words(self):
+        await self.request("GET /words/", "GET", "/words/", {200}, params={"limit": 50})
+
+    async def search(self):
+        query = self.rng.choice(self.words)[:self.rng.randint(2, 5)]
+        await self.request("GET /words/search", "GET", "/words/search", {200}, params={"q": query})
+
+    async def explain(self):
+        await self.request("POST /ai/explain-word/", "POST", "/ai/explain-word/", {200},
+                           json={"word_text": self.rng.choice(self.words)})
+
+
+async def wait_until_up(base_url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout} seconds")
+
+
+async def run_mix(base_url: str, mix: dict[str, int], users: int, virtual_users: int, requests: int,
+                  words: list[str], seed: int) -> dict:
+    """
+    Runs `requests` actions of one traffic mix. The actions are drawn and
+    dealt out to the virtual users round-robin before the run starts, so
+    each virtual user's sequence does not depend on how fast the server
+    answers the others.
+    """
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=virtual_users, max_keepalive_connections=virtual_users)
+    actions, weights = zip(*mix.items())
+    plan = random.Random(f"plan:{seed}").choices(actions, weights, k=requests)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        clients = [
+            VirtualUser(i, f"load-user-{i % users}", client, recorder, words, seed * 1_000_003 + i)
+            for i in range(virtual_users)
+        ]
+
+        # Sign everyone in before the clock starts; this also warms up the
+        # password hashing pool, whose processes start on first use.
+        await asyncio.gather(*(user.login() for user in clients))
+        recorder = Recorder()
+        for user in clients:
+            user.recorder = recorder
+
+        async def drive(user: VirtualUser, actions: list[str]):
+            for action in actions:
+                await getattr(user, action)()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(drive(user, plan[user.number::virtual_users]) for user in clients))
+        return recorder.report(time.perf_counter() - start)
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Ratios of this run's numbers to the baseline's (>1 means more throughput or latency)."""
+    comparison = {}
+    for mix, result in report["mixes"].items():
+        before_mix = baseline.get("mixes", {}).get(mix)
+        if not before_mix:
+            continue
+        endpoints = {}
+        for endpoint, after in result["endpoints"].items():
+            before = before_mix["endpoints"].get(endpoint)
+            if before:
+                endpoints[endpoint] = {
+                    key: after[key] / before[key] if before[key] else None
+                    for key in ("requests_per_second", "p50_ms", "p95_ms", "p99_ms")
+                }
+        comparison[mix] = {
+            "requests_per_second": result["requests_per_second"] / before_mix["requests_per_second"],
+            "endpoints": endpoints,
+        }
+    return {"baseline_revision": baseline.get("revision"), "mixes": comparison}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="backend directory to load-test")
+    parser.add_argument("--users", type=int, default=100, help="seeded users (N)")
+    parser.add_argument("--words", type=int, default=500, help="seeded words per user (M)")
+    parser.add_argument("--mix", nargs="+", choices=sorted(MIXES), default=["mixed"], help="traffic mixes to run")
+    parser.add_argument("--virtual-users", type=int, default=50, help="concurrent simulated clients")
+    parser.add_argument("--requests", type=int, default=2000, help="actions per mix")
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0, help="fake Gemini response time")
+    parser.add_argument("--gemini-jitter-ms", type=float, default=400.0, help="extra random fake Gemini delay")
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.02, help="share of failed fake Gemini calls")
+    parser.add_argument("--bcrypt-rounds", type=int, help="bcrypt cost factor of the server (default: its own)")
+    parser.add_argument("--database-url", help="database to seed and use (default: a temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="an earlier --output file to compare against")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help="port for the server (default: any free port)")
+    args = parser.parse_args()
+    args.app_dir = os.path.abspath(args.app_dir)
+
+    if args.serve:
+        serve(args)
+        return
+
+    words = load_words()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "benchmark-placeholder"),
+        )
+        if args.bcrypt_rounds:
+            env["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+        port = args.port or free_port()
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--serve", "--port", str(port)],
+            cwd=args.app_dir,
+            env=env,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            asyncio.run(wait_until_up(base_url))
+            mixes = {
+                name: asyncio.run(run_mix(base_url, MIXES[name], args.users, args.virtual_users, args.requests,
+                                          words, args.seed))
+                for name in args.mix
+            }
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "app_dir": args.app_dir,
+        "revision": git_revision(args.app_dir),
+        "users": args.users,
+        "words_per_user": args.words,
+        "virtual_users": args.virtual_users,
+        "gemini": {
+            "latency_ms": args.gemini_latency_ms,
+            "jitter_ms": args.gemini_jitter_ms,
+            "failure_rate": args.gemini_failure_rate,
+        },
+        "seed": args.seed,
+        "mixes": mixes,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Failure isolation for calls to an unreliable upstream (Gemini).
+
+A CircuitBreaker stops calling the upstream once it has failed several times
+in a row. Callers then fail fast and serve their fallback, instead of each
+one tying up a worker for the full timeout. After a cool-down, a single
+trial call is let through. If it succeeds the circuit closes again, and if
+it fails the cool-down starts over.
+
+A RetryBudget caps retries at a fraction of regular calls, so retries
+cannot multiply the load on an upstream that is already struggling.
+"""
+import random
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.counters = {
+            "opened": 0,     # times the circuit opened
+            "rejected": 0,   # calls refused while it was open
+        }
+
+    def allow(self) -> bool:
+        """
+        Returns whether a call may go ahead now. While half-open only one
+        trial call is allowed at a time; its outcome must be reported with
+        record_success() or record_failure().
+        """
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def check(self):
+        """Like allow(), but raises CircuitOpenError if the call may not go ahead."""
+        if not self.allow():
+            raise CircuitOpenError("Gemini is unavailable; the circuit breaker is open.")
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.counters["opened"] += 1
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+        self._trial_in_flight = False
+
+    def release(self):
+        """Gives up an allowed call without an outcome, e.g. because it was cancelled."""
+        self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, **self.counters}
+
+
+class RetryBudget:
+    """
+    A token bucket for retries. Every call deposits `ratio` tokens and every
+    retry spends one, so retries stay at about `ratio` times the calls. A
+    trickle of `min_per_second` tokens keeps retries possible when traffic
+    is low. The balance is capped at one second's worth of the trickle plus
+    ten retries, so a quiet period does not save up a burst.
+    """
+    def __init__(self, ratio: float, min_per_second: float, clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.clock = clock
+        self.capacity = min_per_second + 10
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self.counters = {"retries": 0, "exhausted": 0}
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+
+    def deposit(self):
+        """Records a call (not a retry)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Spends a token for one retry, or returns False if the budget is used up."""
+        self._refill()
+        if self.tokens < 1:
+            self.counters["exhausted"] += 1
+            return False
+        self.tokens -= 1
+        self.counters["retries"] += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"tokens": self.tokens, **self.counters}
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Full-jitter exponential backoff: a random delay up to base * 2**attempt, capped."""
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
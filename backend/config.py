@@ -1,10 +1,167 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
-    google_api_key: str
+    # Gemini API key. Only needed for AI features, which fall back to canned
+    # answers without it; the client is created on the first AI call.
+    google_api_key: str = ""
+
+    # --- Database ---
+    # Any SQLAlchemy URL; production uses PostgreSQL.
+    database_url: str = "sqlite:///./sql_app.db"
+    # Connections kept open per worker, plus how many extra may be opened under load.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # Seconds to wait for a free connection before failing the request.
+    db_pool_timeout_seconds: float = 30.0
+    # Recycle connections older than this, before the server drops them.
+    db_pool_recycle_seconds: int = 1800
+    # Test connections on checkout so a dropped connection is replaced transparently.
+    db_pool_pre_ping: bool = True
+    # Server-side statement timeout for PostgreSQL (0 disables it).
+    db_statement_timeout_ms: int = 0
+    # How long SQLite waits on a locked database before giving up.
+    sqlite_busy_timeout_ms: int = 5000
+    # Create missing tables when a worker starts. Deploys run migrate.py once
+    # instead and turn this off, so workers start faster.
+    db_create_schema_on_startup: bool = True
+
+    # --- AI response cache ---
+    # Number of entries kept in each worker's in-process LRU tier.
+    ai_cache_memory_size: int = 2048
+    # How long a cached AI response stays valid (both tiers), in seconds.
+    ai_cache_ttl_seconds: int = 60 * 60 * 24 * 30
+    # Upper bound on rows in the shared database tier before the oldest are evicted.
+    ai_cache_max_rows: int = 100_000
+
+    # --- AI concurrency limits ---
+    # Maximum number of Gemini calls in flight per worker.
+    ai_max_concurrency: int = 16
+    # Seconds to wait for a single Gemini call before giving up.
+    ai_timeout_seconds: float = 20.0
+    # Maximum number of AI requests a single user may have in flight.
+    ai_max_inflight_per_user: int = 2
+
+    # --- Gemini failure handling ---
+    # Consecutive failed Gemini calls that open the circuit breaker, and how
+    # long it then fails fast before letting a trial call through.
+    ai_circuit_failure_threshold: int = 5
+    ai_circuit_reset_seconds: float = 30.0
+    # Retries of a failed call. All attempts together stay within ai_timeout_seconds.
+    ai_max_retries: int = 2
+    # The backoff before retry n is random, up to base * 2**n seconds (at most the max).
+    ai_retry_base_delay_seconds: float = 0.25
+    ai_retry_max_delay_seconds: float = 2.0
+    # Retries allowed per call (0.1 means at most 10% extra calls), plus a floor per second.
+    ai_retry_budget_ratio: float = 0.1
+    ai_retry_budget_min_per_second: float = 1.0
+
+    # --- Batch explanations ---
+    # Number of words packed into a single Gemini prompt.
+    ai_batch_chunk_size: int = 25
+    # How many times words that came back missing or malformed are retried.
+    ai_batch_max_retries: int = 2
+    # Maximum number of words accepted by one batch request.
+    ai_batch_max_words: int = 500
+
+    # --- Review scheduler ---
+    # Scheduling algorithm: "classic", "sm2" or "fsrs" (see srs.py).
+    srs_algorithm: str = "classic"
+    # Target recall probability at review time (fsrs only).
+    srs_desired_retention: float = 0.9
+    # Upper bound on the interval between two reviews, in days.
+    srs_max_interval_days: int = 36500
+    # Number of per-user review cursors kept in memory by each worker.
+    review_cursor_cache_size: int = 10_000
+    # Seconds of inactivity after which a user's review cursor is dropped.
+    review_cursor_ttl_seconds: int = 60 * 60
+    # Maximum number of answers accepted by one batched review submission.
+    review_batch_max_answers: int = 1000
+
+    # --- Due queue ---
+    # Build each day's review queues inside the app. With several workers the
+    # first one to claim a day builds it; alternatively run due_queue.py from cron.
+    due_queue_schedule_enabled: bool = True
+    # Local hour after which the next day's queues are built.
+    due_queue_build_hour: int = 23
+    # Seconds between checks for a day whose queues still need building.
+    due_queue_check_interval_seconds: int = 15 * 60
+    # Words queued per user and day; words beyond it are served straight from the words table.
+    due_queue_max_words: int = 1000
+    # Users whose queues are built per statement and transaction.
+    due_queue_batch_users: int = 500
+    # An unfinished build older than this is assumed dead and may be claimed again.
+    due_queue_claim_timeout_seconds: int = 60 * 60
+
+    # --- Review forecast ---
+    # Furthest ahead, in days, a forecast may look.
+    review_forecast_max_days: int = 365
+    # Monte-Carlo runs per simulated forecast, by default and at most.
+    review_simulation_default_runs: int = 20
+    review_simulation_max_runs: int = 200
+    # Accuracy assumed for a user with no review history yet.
+    review_simulation_prior_accuracy: float = 0.85
+
+    # --- Word suggestions ---
+    # Number of words returned by /ai/suggest-words/.
+    word_suggestion_count: int = 5
+    # The most frequent words in the index that are never suggested (too basic).
+    word_index_skip_common: int = 2000
+    # Suggestions are sampled from this many nearest neighbours.
+    word_index_candidates: int = 50
+    # Per-user index rows of the known words kept in memory by each worker.
+    word_index_user_cache_size: int = 1000
+    word_index_user_ttl_seconds: int = 60 * 60
+    # Most recent words sent to Gemini when the index is not available.
+    word_suggestion_fallback_sample: int = 10
+
+    # --- Word search ---
+    # Maximum number of results returned by one search.
+    word_search_max_results: int = 100
+    # Per-user trigram indexes kept in memory by each worker (not used on PostgreSQL).
+    word_search_index_cache_size: int = 1000
+    word_search_index_ttl_seconds: int = 60 * 60
+
+    # --- Bulk word import ---
+    # Rows inserted per transaction, by default and at most.
+    bulk_import_batch_size: int = 500
+    bulk_import_max_batch_size: int = 5000
+    # Maximum number of skipped rows listed individually in the import summary.
+    bulk_import_max_reported_rows: int = 1000
+    # Longest line (NDJSON) or record (CSV) accepted, in characters; longer ones are invalid rows.
+    bulk_import_max_record_length: int = 64 * 1024
+
+    # --- Export ---
+    # Rows fetched from the database cursor per round trip.
+    export_batch_size: int = 1000
+
+    # --- Password hashing ---
+    # bcrypt cost factor. Hashes made with a different cost are rehashed at the next login.
+    bcrypt_rounds: int = 12
+    # Processes per worker that run bcrypt (0 means one per CPU).
+    password_hash_processes: int = 2
+    # Hashing jobs that may wait for a free process before logins and sign-ups get a 503.
+    password_hash_max_queue: int = 32
+    # Seconds clients are told to wait (Retry-After) when hashing is at capacity.
+    password_hash_retry_after_seconds: int = 1
+
+    # --- Authentication ---
+    # Key used to sign tokens. Set a long random value in production.
+    jwt_secret_key: str = "a_very_secret_key_that_should_be_in_a_env_file"
+    jwt_algorithm: str = "HS256"
+    # Lifetime of access tokens, and of the refresh tokens used to renew them.
+    access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 30
+    # Number of verified access tokens cached per worker, and the longest one
+    # is trusted before it is verified again (never past its expiry).
+    auth_user_cache_size: int = 10_000
+    auth_user_cache_ttl_seconds: int = 60 * 30
+
+    # --- Metrics ---
+    # Answer requests sent with "X-Profile: 1" with a Server-Timing breakdown.
+    metrics_profiling_header: bool = True
 
     # This tells Pydantic to load the variables from a .env file
     model_config = SettingsConfigDict(env_file=".env")
 
 # Create an instance of the settings
-settings = Settings()
\ No newline at end of file
+settings = Settings()
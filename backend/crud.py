@@ -1,62 +1,604 @@
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from sqlalchemy import Date, case, delete, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import base64
 import datetime
-import models, schemas, security
+import json
+import numpy as np
+import models, schemas, security, srs, word_index, word_search
+from config import settings
+from database import IS_POSTGRES, IS_SQLITE
 
 # --- User CRUD ---
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """
     Queries the database for a user with a specific username.
     """
-    return db.query(models.User).filter(models.User.username == username).first()
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
 
-def create_user(db: Session, user: schemas.UserCreate):
+async def revoke_refresh_token(db: AsyncSession, jti: str, expires_at: datetime.datetime) -> bool:
+    """
+    Puts a refresh token on the denylist. Returns False if it already was,
+    i.e. the token has been used or revoked before. Listed tokens that have
+    expired anyway are dropped at the same time.
+    """
+    now = datetime.datetime.utcnow()
+    await db.execute(delete(models.RevokedRefreshToken).where(models.RevokedRefreshToken.expires_at <= now))
+    db.add(models.RevokedRefreshToken(jti=jti, expires_at=expires_at))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return True
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
     """
     Creates a new user in the database.
     """
-    # Hash the password before storing it.
-    hashed_password = security.get_password_hash(user.password)
+    # Hash the password before storing it. bcrypt is deliberately slow, so it
+    # runs in the hashing process pool (see security.hash_password_async).
+    hashed_password = await security.hash_password_async(user.password)
     
     # Create a new User model instance.
     db_user = models.User(username=user.username, hashed_password=hashed_password)
     
     # Add the new user to the session, commit it, and refresh to get the new ID.
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
-def get_user_words(db: Session, user_id: int, skip: int = 0, limit: int = 100):
+async def update_user_password_hash(db: AsyncSession, db_user: models.User, hashed_password: str):
+    """
+    Replaces a user's password hash, e.g. with one using the current bcrypt
+    cost factor after a successful login.
+    """
+    db_user.hashed_password = hashed_password
+    await db.commit()
+
+async def get_user_word_stats(db: AsyncSession, user_id: int, today: datetime.date) -> dict:
+    """
+    Computes a user's vocabulary statistics with a single aggregate query.
+    """
+    result = await db.execute(select(
+        func.count(models.Word.id),
+        func.coalesce(func.sum(case((models.Word.next_review_due <= today, 1), else_=0)), 0),
+        func.avg(models.Word.difficulty),
+    ).where(models.Word.owner_id == user_id))
+    total_words, due_today, mean_difficulty = result.one()
+    return {
+        "total_words": total_words,
+        "due_today": due_today,
+        "mean_difficulty": float(mean_difficulty) if mean_difficulty is not None else None,
+    }
+
+# --- Word CRUD ---
+
+# Sort options for word listings. Every sort is made unique (and therefore
+# stable across pages) by breaking ties on the word id.
+WORD_SORT_COLUMNS = {
+    "id": models.Word.id,
+    "text": models.Word.text,
+    "difficulty": models.Word.difficulty,
+    "next_review_due": models.Word.next_review_due,
+}
+
+def encode_word_cursor(sort: str, word: models.Word) -> str:
+    """
+    Builds an opaque cursor pointing just after `word` in the given sort order.
+    """
+    column = WORD_SORT_COLUMNS[sort.lstrip("-")]
+    value = getattr(word, column.key)
+    if isinstance(value, datetime.date):
+        value = value.isoformat()
+    payload = json.dumps({"s": sort, "v": value, "id": word.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_word_cursor(cursor: str, sort: str) -> tuple:
+    """
+    Turns a cursor from encode_word_cursor() back into a (value, id) tuple.
+    Raises ValueError if the cursor is malformed or was made for another sort.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value, word_id = payload["v"], int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if payload.get("s") != sort:
+        raise ValueError("Cursor does not match the requested sort order")
+    if sort.lstrip("-") == "next_review_due" and value is not None:
+        value = datetime.date.fromisoformat(value)
+    return value, word_id
+
+async def get_user_words(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 100,
+    sort: str = "id",
+    after: tuple | None = None,
+    due_before: datetime.date | None = None,
+    min_difficulty: int | None = None,
+    max_difficulty: int | None = None,
+    prefix: str | None = None,
+):
+    """
+    Retrieves a page of words for a specific user.
+
+    Filtering and sorting happen in the database. `sort` is a key of
+    WORD_SORT_COLUMNS, optionally prefixed with "-" for descending order.
+    `after` is the decoded cursor of the previous page; only words after it
+    are returned (keyset pagination), so deep pages cost the same as the
+    first one.
+    """
+    descending = sort.startswith("-")
+    column = WORD_SORT_COLUMNS[sort.lstrip("-")]
+
+    query = select(models.Word).where(models.Word.owner_id == user_id)
+    if due_before is not None:
+        query = query.where(models.Word.next_review_due <= due_before)
+    if min_difficulty is not None:
+        query = query.where(models.Word.difficulty >= min_difficulty)
+    if max_difficulty is not None:
+        query = query.where(models.Word.difficulty <= max_difficulty)
+    normalized_prefix = word_search.normalize_text(prefix or "")
+    if normalized_prefix:
+        # The same range scan as search_user_words, so the match does not
+        # depend on the database's case rules.
+        query = query.where(
+            models.Word.normalized_text >= normalized_prefix,
+            models.Word.normalized_text < normalized_prefix + "\U0010ffff",
+        )
+
+    if column is models.Word.id:
+        if after is not None:
+            query = query.where(models.Word.id < after[1] if descending else models.Word.id > after[1])
+        order_by = [models.Word.id.desc() if descending else models.Word.id]
+    else:
+        if after is not None:
+            key, cursor_key = tuple_(column, models.Word.id), tuple_(*after)
+            query = query.where(key < cursor_key if descending else key > cursor_key)
+        if descending:
+            order_by = [column.desc(), models.Word.id.desc()]
+        else:
+            order_by = [column, models.Word.id]
+
+    result = await db.execute(query.order_by(*order_by).limit(limit))
+    return result.scalars().all()
+
+# --- Word search ---
+
+# Trigram indexes of users' words, for databases without pg_trgm.
+trigram_indexes = word_search.TrigramIndexCache(
+    max_users=settings.word_search_index_cache_size,
+    ttl_seconds=settings.word_search_index_ttl_seconds,
+)
+
+async def search_user_words(db: AsyncSession, user_id: int, query: str, limit: int) -> list[dict]:
     """
-    Retrieves all words for a specific user.
+    Searches a user's words. Words starting with the (normalized) query come
+    first, in alphabetical order; the rest of the page is filled with typo
+    matches, most similar first. Returns {"word", "match", "score"} dicts,
+    with match "prefix" or "fuzzy" and score the trigram similarity.
     """
-    return db.query(models.Word).filter(models.Word.owner_id == user_id).offset(skip).limit(limit).all()
+    normalized = word_search.normalize_text(query)
+    if not normalized:
+        return []
+
+    # A range scan over the (owner_id, normalized_text) index. U+10FFFF sorts
+    # after every character, under SQLite's and the column's "C" collation.
+    result = await db.execute(
+        select(models.Word)
+        .where(
+            models.Word.owner_id == user_id,
+            models.Word.normalized_text >= normalized,
+            models.Word.normalized_text < normalized + "\U0010ffff",
+        )
+        .order_by(models.Word.normalized_text)
+        .limit(limit)
+    )
+    hits = [{"word": word, "match": "prefix", "score": None} for word in result.scalars()]
+    if len(hits) >= limit:
+        return hits
+
+    seen = {hit["word"].id for hit in hits}
+    for word, score in await _search_similar_words(db, user_id, normalized, limit + len(seen)):
+        if word.id not in seen and len(hits) < limit:
+            hits.append({"word": word, "match": "fuzzy", "score": score})
+    return hits
+
+async def _get_normalized_texts(db: AsyncSession, user_id: int, after_id: int) -> tuple[list[int], list[str]]:
+    """Returns the ids and normalized texts of a user's words with an id above `after_id`."""
+    result = await db.execute(
+        select(models.Word.id, models.Word.normalized_text)
+        .where(models.Word.owner_id == user_id, models.Word.id > after_id)
+        .order_by(models.Word.id)
+    )
+    rows = result.all()
+    return [row.id for row in rows], [row.normalized_text or "" for row in rows]
+
+async def _search_similar_words(db: AsyncSession, user_id: int, normalized: str, limit: int) -> list[tuple]:
+    """Returns up to `limit` (word, similarity) pairs, most similar first."""
+    if IS_POSTGRES:
+        similarity = func.similarity(models.Word.normalized_text, normalized)
+        result = await db.execute(
+            select(models.Word, similarity)
+            .where(models.Word.owner_id == user_id, models.Word.normalized_text.op("%")(normalized))
+            .order_by(similarity.desc(), models.Word.id)
+            .limit(limit)
+        )
+        return [(word, float(score)) for word, score in result.all()]
+
+    # Elsewhere, an in-process trigram index per user. Words are only ever
+    # added, so a cached index just needs the words after its highest id.
+    max_id = await db.scalar(select(func.max(models.Word.id)).where(models.Word.owner_id == user_id))
+    cached = trigram_indexes.get(user_id)
+    if cached is None:
+        ids, texts = await _get_normalized_texts(db, user_id, after_id=0)
+        index = await asyncio.to_thread(word_search.TrigramIndex, ids, texts)
+        trigram_indexes.put(user_id, max_id, index)
+    else:
+        indexed_max_id, index = cached
+        if max_id != indexed_max_id:
+            index.add(*await _get_normalized_texts(db, user_id, after_id=indexed_max_id or 0))
+            trigram_indexes.put(user_id, max_id, index)
 
-def create_user_word(db: Session, word: schemas.WordBase, user_id: int):
+    matches = index.search(normalized, limit)
+    if not matches:
+        return []
+    result = await db.execute(
+        select(models.Word).where(models.Word.owner_id == user_id, models.Word.id.in_([id for id, _ in matches]))
+    )
+    words = {word.id: word for word in result.scalars()}
+    return [(words[id], score) for id, score in matches if id in words]
+
+async def create_user_word(db: AsyncSession, word: schemas.WordBase, user_id: int):
     """
     Creates a new word in the database and links it to a user.
     Expects a WordBase object that includes the AI-generated definition.
+    Returns None if the user already has the word (same normalized text).
     """
     next_review = datetime.date.today()
     
     db_word = models.Word(
         text=word.text,
+        normalized_text=word_search.normalize_text(word.text),
         definition=word.definition,
         owner_id=user_id,
         next_review_due=next_review
     )
     db.add(db_word)
-    db.commit()
-    db.refresh(db_word)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return None
+    await db.refresh(db_word)
     return db_word
 
-def update_word_review_status(db: Session, word_id: int, user_id: int, new_date: datetime.date, new_difficulty: int):
-    """Updates a word's next review date and difficulty in the database."""
-    db_word = db.query(models.Word).filter(models.Word.id == word_id, models.Word.owner_id == user_id).first()
-    if db_word:
-        db_word.next_review_due = new_date
-        db_word.difficulty = new_difficulty
-        db.commit()
-        db.refresh(db_word)
-    return db_word
\ No newline at end of file
+# --- Word suggestions ---
+
+# Index rows of the words each user knows, for word_index suggestions.
+known_word_rows = word_index.KnownRowsCache(
+    max_users=settings.word_index_user_cache_size,
+    ttl_seconds=settings.word_index_user_ttl_seconds,
+)
+
+def _known_texts_query(user_id: int):
+    """The text of a user's words, lower-cased and trimmed, as the word index expects them."""
+    return select(func.lower(func.trim(models.Word.text))).where(models.Word.owner_id == user_id)
+
+async def get_recent_word_texts(db: AsyncSession, user_id: int, limit: int) -> list[str]:
+    """Returns the text of the user's `limit` most recently added words, lower-cased and trimmed."""
+    result = await db.execute(_known_texts_query(user_id).order_by(models.Word.id.desc()).limit(limit))
+    return result.scalars().all()
+
+async def get_known_word_rows(db: AsyncSession, user_id: int):
+    """
+    Returns the word_index rows of the user's words (those in the index).
+    They are cached per user; like the trigram indexes, a cached entry only
+    needs the words after its highest id, so a call is usually one index
+    lookup.
+    """
+    max_id = await db.scalar(select(func.max(models.Word.id)).where(models.Word.owner_id == user_id))
+    cached = known_word_rows.get(user_id)
+    if cached is not None and cached[0] == max_id:
+        return cached[1]
+
+    after_id, rows = cached if cached is not None else (None, None)
+    result = await db.execute(_known_texts_query(user_id).where(models.Word.id > (after_id or 0)))
+    new_rows = word_index.index.rows(result.scalars())
+    rows = new_rows if rows is None else np.concatenate([rows, new_rows])
+    known_word_rows.put(user_id, max_id, rows)
+    return rows
+
+async def get_existing_word_texts(db: AsyncSession, user_id: int, texts: list[str]) -> set[str]:
+    """
+    Returns which of `texts` the user already has, compared by normalized
+    text (see word_search.normalize_text). The returned texts are normalized.
+    """
+    normalized = {word_search.normalize_text(text) for text in texts}
+    result = await db.execute(
+        select(models.Word.normalized_text).where(
+            models.Word.owner_id == user_id,
+            models.Word.normalized_text.in_(normalized),
+        )
+    )
+    return set(result.scalars())
+
+async def create_user_words_bulk(db: AsyncSession, words: list[schemas.WordCreate], user_id: int) -> int:
+    """
+    Inserts many words for a user with a single multi-row INSERT and commits
+    them in one transaction. Words the user already has (for instance, added
+    by a concurrent request) are skipped rather than failing the batch.
+    Returns the number of words actually inserted.
+    """
+    if not words:
+        return 0
+    next_review = datetime.date.today()
+    result = await db.execute(_insert_new_words().returning(models.Word.id), [
+        {
+            "text": word.text,
+            "normalized_text": word_search.normalize_text(word.text),
+            "definition": word.definition,
+            "owner_id": user_id,
+            "next_review_due": next_review,
+        }
+        for word in words
+    ])
+    inserted = len(result.all())
+    await db.commit()
+    return inserted
+
+def _insert_new_words():
+    """An INSERT into words that ignores rows violating the per-user uniqueness of normalized_text."""
+    if IS_POSTGRES:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif IS_SQLITE:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(models.Word)
+    return dialect_insert(models.Word).on_conflict_do_nothing(index_elements=["owner_id", "normalized_text"])
+
+async def import_user_words(db: AsyncSession, user_id: int, records, batch_size: int, max_reported_rows: int) -> dict:
+    """
+    Imports words from an async iterator of (row_number, record, error)
+    tuples, as produced by word_io. Rows are validated, deduplicated against
+    the user's existing words (and each other), and inserted in batches of
+    `batch_size`, one transaction per batch.
+
+    Only rows that were NOT imported are reported individually, up to
+    `max_reported_rows` of them, so memory use does not grow with the upload.
+    """
+    summary = {"created": 0, "duplicates": 0, "invalid": 0, "rows": [], "rows_truncated": False}
+
+    def report(row: int, text: str | None, status: str, error: str | None = None):
+        if len(summary["rows"]) < max_reported_rows:
+            summary["rows"].append({"row": row, "text": text, "status": status, "error": error})
+        else:
+            summary["rows_truncated"] = True
+
+    async def flush(batch: list[tuple[int, schemas.WordCreate]]):
+        existing = await get_existing_word_texts(db, user_id, [word.text for _, word in batch])
+        to_insert = []
+        for row, word in batch:
+            key = word_search.normalize_text(word.text)
+            if key in existing:
+                summary["duplicates"] += 1
+                report(row, word.text, "duplicate")
+            else:
+                # Also catches repeats within the batch itself. Repeats across
+                # batches are caught by the query, since earlier batches are committed.
+                existing.add(key)
+                to_insert.append(word)
+        created = await create_user_words_bulk(db, to_insert, user_id=user_id)
+        summary["created"] += created
+        # Words added by a concurrent request since the check above.
+        summary["duplicates"] += len(to_insert) - created
+
+    batch = []
+    async for row, record, error in records:
+        if error is None:
+            try:
+                word = schemas.WordCreate.model_validate(record)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            else:
+                word.text = word.text.strip()
+                if not word.text:
+                    error = "text: must not be empty"
+        if error is not None:
+            summary["invalid"] += 1
+            text = record.get("text") if isinstance(record, dict) else None
+            report(row, str(text) if text is not None else None, "invalid", error)
+            continue
+
+        batch.append((row, word))
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return summary
+
+async def stream_user_words_for_export(
+    db: AsyncSession,
+    user_id: int,
+    updated_since: datetime.datetime | None = None,
+    batch_size: int = 1000,
+):
+    """
+    Streams all of a user's words in id order as batches of plain rows (in
+    word_io.EXPORT_FIELDS order), using a server-side cursor, so memory use
+    does not depend on the size of the vocabulary. An aware `updated_since`
+    is converted to naive UTC, the form updated_at is stored in.
+    """
+    query = select(
+        models.Word.id,
+        models.Word.text,
+        models.Word.definition,
+        models.Word.difficulty,
+        models.Word.next_review_due,
+        models.Word.updated_at,
+    ).where(models.Word.owner_id == user_id)
+    if updated_since is not None:
+        if updated_since.tzinfo is not None:
+            updated_since = updated_since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        query = query.where(models.Word.updated_at >= updated_since)
+    query = query.order_by(models.Word.id).execution_options(yield_per=batch_size)
+
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield partition
+
+async def get_user_word(db: AsyncSession, word_id: int, user_id: int):
+    """
+    Retrieves a single word, but only if it belongs to the given user.
+    """
+    result = await db.execute(
+        select(models.Word).where(models.Word.id == word_id, models.Word.owner_id == user_id)
+    )
+    return result.scalars().first()
+
+async def get_due_words(
+    db: AsyncSession,
+    user_id: int,
+    due_on: datetime.date,
+    after: tuple | None = None,
+    limit: int = 1,
+    exclude_queued: bool = False,
+):
+    """
+    Retrieves a user's words that are due on or before `due_on`, ordered by
+    (next_review_due, id). `after` is the (next_review_due, id) of the last
+    word already served; only words after it are returned (keyset pagination,
+    answered from the (owner_id, next_review_due) index). With
+    `exclude_queued`, words in the user's due queue for `due_on` are left out.
+    """
+    query = select(models.Word).where(
+        models.Word.owner_id == user_id,
+        models.Word.next_review_due <= due_on,
+    )
+    if after is not None:
+        query = query.where(tuple_(models.Word.next_review_due, models.Word.id) > tuple_(*after))
+    if exclude_queued:
+        query = query.where(
+            ~select(models.DueQueueEntry.word_id)
+            .where(
+                models.DueQueueEntry.owner_id == user_id,
+                models.DueQueueEntry.due_on == due_on,
+                models.DueQueueEntry.word_id == models.Word.id,
+            )
+            .exists()
+        )
+    result = await db.execute(query.order_by(models.Word.next_review_due, models.Word.id).limit(limit))
+    return result.scalars().all()
+
+async def get_queued_due_words(db: AsyncSession, user_id: int, due_on: datetime.date, after_position: int = 0, limit: int = 1):
+    """
+    Retrieves words from the user's precomputed due queue for `due_on` (see
+    due_queue.py), after queue position `after_position`, as (position, word)
+    tuples in queue order. A range read on the queue's primary key; words
+    that are no longer due (already reviewed) or no longer exist are skipped.
+    """
+    result = await db.execute(
+        select(models.DueQueueEntry.position, models.Word)
+        .join(models.Word, models.Word.id == models.DueQueueEntry.word_id)
+        .where(
+            models.DueQueueEntry.owner_id == user_id,
+            models.DueQueueEntry.due_on == due_on,
+            models.DueQueueEntry.position > after_position,
+            models.Word.owner_id == user_id,
+            models.Word.next_review_due <= due_on,
+        )
+        .order_by(models.DueQueueEntry.position)
+        .limit(limit)
+    )
+    return result.all()
+
+async def get_due_histogram(db: AsyncSession, user_id: int, until: datetime.date) -> list[tuple[datetime.date, int]]:
+    """
+    Counts a user's words per due date, for every date up to and including
+    `until` (overdue dates included), with a single GROUP BY.
+    Returns (next_review_due, count) tuples in date order.
+    """
+    result = await db.execute(
+        select(models.Word.next_review_due, func.count(models.Word.id))
+        .where(models.Word.owner_id == user_id, models.Word.next_review_due <= until)
+        .group_by(models.Word.next_review_due)
+        .order_by(models.Word.next_review_due)
+    )
+    return result.all()
+
+async def get_review_state_groups(db: AsyncSession, user_id: int, until: datetime.date, columns: tuple[str, ...]) -> list:
+    """
+    Summarizes a user's words due on or before `until` as groups of words
+    with the same next_review_due and the same values in `columns` (state
+    column names, or last_reviewed_at, which is grouped by date), so that
+    simulating a large deck does not mean loading every word. Floats are
+    rounded so that similar words share a group.
+
+    Returns row mappings with "cards" (the group size), "next_review_due",
+    the `columns`, and "reviews" and "lapses" summed over the group.
+    """
+    word = models.Word
+    expressions = {
+        "last_reviewed_at": func.date(word.last_reviewed_at, type_=Date),
+        "ease_factor": func.round(word.ease_factor * 100) / 100,
+        "stability": func.round(word.stability * 10) / 10,
+    }
+    keys = [word.next_review_due] + [
+        expressions[name].label(name) if name in expressions else getattr(word, name) for name in columns
+    ]
+    result = await db.execute(
+        select(
+            func.count(word.id).label("cards"),
+            *keys,
+            func.sum(word.reviews).label("reviews"),
+            func.sum(word.lapses).label("lapses"),
+        )
+        .where(word.owner_id == user_id, word.next_review_due <= until)
+        .group_by(*keys)
+    )
+    return result.mappings().all()
+
+async def save_word_review(db: AsyncSession, db_word: models.Word, values: dict):
+    """
+    Saves a word's new review state (as returned by srs.apply_answers) to the database.
+    """
+    for name, value in values.items():
+        if name != "id":
+            setattr(db_word, name, value)
+    await db.commit()
+    await db.refresh(db_word)
+    return db_word
+
+async def get_review_states(db: AsyncSession, user_id: int, word_ids: list[int]) -> dict[int, dict]:
+    """
+    Loads the review state of several of a user's words, locking the rows
+    (where the database supports it) until the transaction ends.
+    Returns {word_id: row} with "id", "last_reviewed_at" and the
+    srs.STATE_COLUMNS; missing ids are left out.
+    """
+    columns = [models.Word.id, models.Word.last_reviewed_at] + [getattr(models.Word, name) for name in srs.STATE_COLUMNS]
+    result = await db.execute(
+        select(*columns)
+        .where(models.Word.owner_id == user_id, models.Word.id.in_(word_ids))
+        .with_for_update()
+    )
+    return {row["id"]: dict(row) for row in result.mappings()}
+
+async def bulk_update_word_reviews(db: AsyncSession, updates: list[dict]):
+    """
+    Writes many review results (as returned by srs.apply_answers) with a
+    single executemany UPDATE by primary key and commits.
+    """
+    if updates:
+        now = datetime.datetime.utcnow()
+        await db.execute(update(models.Word), [{**values, "updated_at": now} for values in updates])
+    await db.commit()
@@ -1,12 +1,169 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+import metrics
+from config import settings
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def normalize_database_url(url: str) -> str:
+    """
+    Hosting providers (Render, Heroku) hand out "postgres://" URLs, which
+    SQLAlchemy no longer accepts.
+    """
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def to_async_url(url: str) -> str:
+    """
+    Picks the asyncio driver for a database URL: aiosqlite for SQLite and
+    asyncpg for PostgreSQL. URLs that already name a driver are left alone.
+    """
+    scheme, _, rest = url.partition("://")
+    if scheme == "sqlite":
+        return "sqlite+aiosqlite://" + rest
+    if scheme == "postgresql":
+        return "postgresql+asyncpg://" + rest
+    return url
+
+
+class _PoolStatsMixin:
+    """
+    Records how often connections are checked out of a pool and how long
+    callers wait for one, so the pool can be sized against the number of
+    Gunicorn workers.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class InstrumentedQueuePool(_PoolStatsMixin, QueuePool):
+    """A QueuePool with checkout/wait statistics."""
+
+
+class InstrumentedAsyncQueuePool(_PoolStatsMixin, AsyncAdaptedQueuePool):
+    """An AsyncAdaptedQueuePool with checkout/wait statistics."""
+
+
+SQLALCHEMY_DATABASE_URL = normalize_database_url(settings.database_url)
+ASYNC_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+IS_POSTGRES = SQLALCHEMY_DATABASE_URL.startswith("postgresql")
+USE_POOL = ":memory:" not in SQLALCHEMY_DATABASE_URL
+
+
+def _pool_options(poolclass) -> dict:
+    if not USE_POOL:
+        return {}
+    return dict(
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers and a writer work at the same time, NORMAL sync is
+    # safe with WAL and avoids an fsync per commit, and the busy timeout
+    # makes concurrent writers wait instead of failing with "database is locked".
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.close()
+
+
+# --- Sync engine ---
+# Used for schema creation and offline scripts. Requests go through the async engine.
+connect_args = {}
+if IS_SQLITE:
+    connect_args["check_same_thread"] = False
+elif settings.db_statement_timeout_ms and IS_POSTGRES:
+    # Abort runaway queries server-side instead of tying up a pooled connection.
+    connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args, **_pool_options(InstrumentedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- Async engine ---
+# Serves the request path, so queries never block the event loop or need a threadpool hop.
+async_connect_args = {}
+if settings.db_statement_timeout_ms and IS_POSTGRES:
+    async_connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, connect_args=async_connect_args, **_pool_options(InstrumentedAsyncQueuePool)
+)
+# expire_on_commit=False keeps loaded attributes usable after commit; lazy
+# loading them again would need I/O, which AsyncSession does not allow implicitly.
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# Query counts and timings per request, for /metrics and profiling headers.
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
 Base = declarative_base()
+
+
+def _single_pool_stats(pool) -> dict:
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=settings.db_max_overflow,
+        )
+    if isinstance(pool, _PoolStatsMixin):
+        with pool._stats_lock:
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_seconds_total=pool.wait_seconds_total,
+                wait_seconds_max=pool.wait_seconds_max,
+                wait_seconds_mean=pool.wait_seconds_total / pool.checkouts if pool.checkouts else 0.0,
+            )
+    return stats
+
+
+def pool_stats() -> dict:
+    """Returns the state and wait statistics of the async (request) and sync pools."""
+    return {
+        "async": _single_pool_stats(async_engine.pool),
+        "sync": _single_pool_stats(engine.pool),
+    }
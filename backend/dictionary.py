@@ -0,0 +1,165 @@
+"""
+Bundled offline dictionary, used for definitions while Gemini is unavailable.
+
+data/dictionary.tsv has one line per word, "word<TAB>definition<TAB>example",
+sorted bytewise by word. The file is memory-mapped and searched with a
+binary search over byte offsets, so a lookup reads a few pages, nothing is
+parsed at startup, and every Gunicorn worker shares the same page cache.
+
+The file is built once, from the word list in data/words.txt and the
+WordNet 3.0 database files (index.noun, data.noun, ...):
+
+    python dictionary.py /path/to/wordnet/dict
+"""
+import argparse
+import mmap
+import os
+import re
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DICTIONARY_PATH = os.path.join(DATA_DIR, "dictionary.tsv")
+WORDS_PATH = os.path.join(DATA_DIR, "words.txt")
+
+
+class LocalDictionary:
+    """Binary search over the sorted, memory-mapped dictionary file."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._map: mmap.mmap | None = None
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self.path) or not os.path.getsize(self.path):
+                print(f"Dictionary not found at {self.path}; AI fallbacks will be generic.")
+                return
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def lookup(self, word: str) -> tuple[str, str] | None:
+        """
+        Returns (definition, example) for a word, or None if the dictionary
+        does not have it. The example may be empty.
+        """
+        self._load()
+        if self._map is None:
+            return None
+        key = " ".join(word.strip().lower().split()).encode()
+        if not key or b"\t" in key or b"\n" in key:
+            return None
+
+        data = self._map
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b"\n", 0, mid) + 1
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+            tab = data.find(b"\t", start, end)
+            line_key = data[start:tab if tab != -1 else end]
+            if line_key == key:
+                _, definition, example = data[start:end].decode().split("\t")
+                return definition, example
+            if line_key < key:
+                lo = end + 1
+            else:
+                hi = start
+        return None
+
+
+# One dictionary per worker process; the memory map is shared through the page cache.
+dictionary = LocalDictionary(DICTIONARY_PATH)
+
+
+# --- Building the file ---
+
+# Parts of speech in the order preferred when a word is equally common in several.
+_POS_FILES = ("noun", "verb", "adj", "adv")
+
+
+def _read_index(wordnet_dir: str, pos: str) -> dict[str, tuple[int, int]]:
+    """Maps each lemma to (tagged sense count, byte offset of its most common synset)."""
+    entries = {}
+    with open(os.path.join(wordnet_dir, f"index.{pos}"), encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(" "):  # license header
+                continue
+            fields = line.split()
+            pointer_count = int(fields[3])
+            tagged_senses = int(fields[5 + pointer_count])
+            first_synset = int(fields[6 + pointer_count])
+            entries[fields[0]] = (tagged_senses, first_synset)
+    return entries
+
+
+def _read_glosses(wordnet_dir: str, pos: str) -> dict[int, str]:
+    """
+    Maps each synset's offset to its gloss. Synsets are keyed by the offset
+    recorded in their line rather than looked up by seeking to it, which
+    also works on copies whose line endings were converted.
+    """
+    glosses = {}
+    with open(os.path.join(wordnet_dir, f"data.{pos}"), encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(" "):  # license header
+                continue
+            glosses[int(line.split(" ", 1)[0])] = line.split(" | ", 1)[1].strip()
+    return glosses
+
+
+def _split_gloss(gloss: str, word: str) -> tuple[str, str]:
+    """Returns the definition in a gloss and an example using `word`, if it has one."""
+    examples = re.findall(r'"([^"]+)"', gloss)
+    definition = gloss.split('; "', 1)[0].strip().rstrip(";").strip()
+    definition = definition[:1].upper() + definition[1:]
+    if not definition.endswith((".", "!", "?")):
+        definition += "."
+    example = next((e.strip() for e in examples if re.search(rf"\b{re.escape(word)}", e, re.IGNORECASE)), "")
+    if example and example[-1] not in ".!?":
+        example += "."
+    return definition, example[:1].upper() + example[1:]
+
+
+def build_dictionary(wordnet_dir: str, words_path: str = WORDS_PATH, output_path: str = DICTIONARY_PATH) -> int:
+    """
+    Writes the dictionary file for every word of the word list that
+    WordNet knows, using the most common sense of its most common part of
+    speech. Returns the number of entries written.
+    """
+    indexes = {pos: _read_index(wordnet_dir, pos) for pos in _POS_FILES}
+    glosses = {pos: _read_glosses(wordnet_dir, pos) for pos in _POS_FILES}
+    with open(words_path) as f:
+        words = sorted({line.strip().lower() for line in f if line.strip()}, key=str.encode)
+    lines = []
+    for word in words:
+        candidates = [(indexes[pos][word][0], -rank, pos) for rank, pos in enumerate(_POS_FILES)
+                      if word in indexes[pos]]
+        if not candidates:
+            continue
+        _, _, pos = max(candidates)
+        definition, example = _split_gloss(glosses[pos][indexes[pos][word][1]], word)
+        lines.append(f"{word}\t{definition}\t{example}\n")
+
+    partial_path = output_path + ".partial"
+    with open(partial_path, "w", encoding="utf-8", newline="\n") as f:
+        f.writelines(lines)
+    os.replace(partial_path, output_path)
+    return len(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline dictionary from WordNet 3.0.")
+    parser.add_argument("wordnet_dir", help="directory with WordNet's index.* and data.* files")
+    args = parser.parse_args()
+    count = build_dictionary(args.wordnet_dir)
+    print(f"Wrote {count} entries to {DICTIONARY_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Precomputed daily review queues.
+
+Building a user's queue for a day means finding their due words in
+(next_review_due, id) order. Doing that ahead of time, for all users in
+batched INSERT ... SELECT statements, turns the first /review/next/ call of
+the day into a range read of a compact (owner_id, due_on, position, word_id)
+table instead of a scan of the user's words, so the morning rush does not
+hit the words table all at once.
+
+Queues are built inside the app (see run_scheduled_builds) or with:
+
+    python due_queue.py [--date YYYY-MM-DD] [--force]
+
+A queue is a snapshot; session_manager.ReviewScheduler skips words that are
+no longer due and afterwards serves due words that are not in the queue.
+"""
+import argparse
+import asyncio
+import datetime
+
+from sqlalchemy import Date, delete, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import migrate
+import models
+from config import settings
+from database import AsyncSessionLocal
+
+
+async def _claim_build(db: AsyncSession, due_on: datetime.date, force: bool) -> bool:
+    """
+    Records that the queues for `due_on` are being built; False if someone
+    else already did. A claim left unfinished for longer than
+    due_queue_claim_timeout_seconds (its builder died) is taken over.
+    """
+    now = datetime.datetime.utcnow()
+    stale = models.DueQueueBuild.due_on == due_on
+    if not force:
+        stale &= models.DueQueueBuild.finished_at.is_(None) & (
+            models.DueQueueBuild.started_at < now - datetime.timedelta(seconds=settings.due_queue_claim_timeout_seconds)
+        )
+    await db.execute(delete(models.DueQueueBuild).where(stale))
+    db.add(models.DueQueueBuild(due_on=due_on, started_at=now))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return True
+
+
+async def _build_batch(db: AsyncSession, due_on: datetime.date, owner_ids: list[int], max_words: int) -> int:
+    """Replaces the queues of `owner_ids` for `due_on` in one statement; returns the words queued."""
+    await db.execute(
+        delete(models.DueQueueEntry).where(
+            models.DueQueueEntry.owner_id.in_(owner_ids),
+            models.DueQueueEntry.due_on == due_on,
+        )
+    )
+    position = func.row_number().over(
+        partition_by=models.Word.owner_id,
+        order_by=(models.Word.next_review_due, models.Word.id),
+    )
+    ranked = (
+        select(
+            models.Word.owner_id,
+            literal(due_on, Date).label("due_on"),
+            position.label("position"),
+            models.Word.id.label("word_id"),
+        )
+        .where(models.Word.owner_id.in_(owner_ids), models.Word.next_review_due <= due_on)
+        .subquery()
+    )
+    result = await db.execute(
+        insert(models.DueQueueEntry).from_select(
+            ["owner_id", "due_on", "position", "word_id"],
+            select(ranked).where(ranked.c.position <= max_words),
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def _release_claim(due_on: datetime.date):
+    """Deletes an unfinished claim, so the next attempt can build the day."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(models.DueQueueBuild).where(
+                models.DueQueueBuild.due_on == due_on, models.DueQueueBuild.finished_at.is_(None)
+            )
+        )
+        await db.commit()
+
+
+async def build_due_queues(
+    due_on: datetime.date,
+    force: bool = False,
+    max_words: int = settings.due_queue_max_words,
+    batch_users: int = settings.due_queue_batch_users,
+) -> dict | None:
+    """
+    Builds every user's due queue for `due_on`, `batch_users` users per
+    statement and transaction, and drops the queues of earlier days.
+
+    Returns {"users", "words", "seconds"}, or None without doing anything
+    if the day was already claimed by another build (unless `force`). If
+    the build fails, its claim is released and the error re-raised.
+    """
+    start = datetime.datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        if not await _claim_build(db, due_on, force):
+            return None
+    try:
+        users, words, finished_at = await _build(due_on, max_words, batch_users)
+    except BaseException:
+        await asyncio.shield(_release_claim(due_on))
+        raise
+    return {"users": users, "words": words, "seconds": (finished_at - start).total_seconds()}
+
+
+async def _build(due_on: datetime.date, max_words: int, batch_users: int) -> tuple[int, int, datetime.datetime]:
+    """Builds the claimed day; returns the users and words queued and when it finished."""
+    async with AsyncSessionLocal() as db:
+        users = words = 0
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(models.User.id).where(models.User.id > last_id).order_by(models.User.id).limit(batch_users)
+            )
+            owner_ids = result.scalars().all()
+            if not owner_ids:
+                break
+            words += await _build_batch(db, due_on, owner_ids, max_words)
+            users += len(owner_ids)
+            last_id = owner_ids[-1]
+
+        # Today's queue stays in use while tomorrow's is built.
+        oldest_kept = min(due_on, datetime.date.today())
+        await db.execute(delete(models.DueQueueEntry).where(models.DueQueueEntry.due_on < oldest_kept))
+        build = await db.get(models.DueQueueBuild, due_on)
+        build.finished_at = datetime.datetime.utcnow()
+        build.users = users
+        build.words = words
+        await db.commit()
+    return users, words, build.finished_at
+
+
+async def run_scheduled_builds():
+    """
+    Keeps today's queues built, and tomorrow's once the local hour reaches
+    due_queue_build_hour. Runs until cancelled. Every worker may run this:
+    a day is built by whichever worker claims it first.
+    """
+    while True:
+        now = datetime.datetime.now()
+        days = [now.date()]
+        if now.hour >= settings.due_queue_build_hour:
+            days.append(now.date() + datetime.timedelta(days=1))
+        for day in days:
+            try:
+                summary = await build_due_queues(day)
+            except Exception as e:
+                print(f"Error building due queues for {day}: {e}")
+                continue
+            if summary is not None:
+                print(f"Built due queues for {day}: {summary['users']} users, {summary['words']} words "
+                      f"in {summary['seconds']:.1f}s")
+        await asyncio.sleep(settings.due_queue_check_interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build every user's review queue for a day.")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="day to build the queues for (default: today)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the day was already built")
+    args = parser.parse_args()
+    migrate.create_schema()
+    summary = asyncio.run(build_due_queues(args.date, force=args.force))
+    if summary is None:
+        print(f"Due queues for {args.date} were already built; use --force to rebuild them.")
+    else:
+        print(f"Built due queues for {args.date}: {summary['users']} users, {summary['words']} words "
+              f"in {summary['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import json
+
+
+class IncrementalJSONObjectParser:
+    """
+    Parses a flat JSON object as it arrives in chunks, reporting each
+    top-level field as soon as its value is complete.
+
+    Anything before the opening brace (such as a ```json fence) is skipped,
+    as is anything after the closing brace.
+
+        parser = IncrementalJSONObjectParser()
+        parser.feed('```json\n{"definition": "Lasting for a ')  # -> []
+        parser.feed('short time.", "exam')                       # -> [("definition", "Lasting for a short time.")]
+    """
+
+    def __init__(self):
+        self._state = "seek_object"
+        self._buffer = []       # characters of the key or value being read
+        self._escaped = False   # the previous character was a backslash
+        self._depth = 0         # nesting depth inside a non-string value
+        self._in_string = False # inside a string nested in a non-string value
+        self._key = None
+        self.done = False
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        """Consumes a chunk of text and returns the fields it completed."""
+        completed = []
+        for char in chunk:
+            if self.done:
+                break
+            field = self._consume(char)
+            if field is not None:
+                completed.append(field)
+        return completed
+
+    def _consume(self, char: str):
+        state = self._state
+
+        if state == "seek_object":
+            if char == "{":
+                self._state = "seek_key"
+            return None
+
+        if state == "seek_key":
+            if char == '"':
+                self._state = "key"
+                self._buffer = []
+            elif char == "}":
+                self.done = True
+            return None
+
+        if state in ("key", "string_value"):
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                text = json.loads('"' + "".join(self._buffer) + '"')
+                if state == "key":
+                    self._key = text
+                    self._state = "seek_colon"
+                    return None
+                self._state = "seek_key"
+                return (self._key, text)
+            self._buffer.append(char)
+            return None
+
+        if state == "seek_colon":
+            if char == ":":
+                self._state = "seek_value"
+            return None
+
+        if state == "seek_value":
+            if char.isspace():
+                return None
+            if char == '"':
+                self._state = "string_value"
+                self._buffer = []
+                return None
+            # Numbers, literals, arrays and nested objects are collected raw
+            # and decoded once the value ends.
+            self._state = "raw_value"
+            self._buffer = []
+            self._depth = 0
+            self._in_string = False
+            return self._consume_raw(char)
+
+        if state == "raw_value":
+            return self._consume_raw(char)
+
+        return None
+
+    def _consume_raw(self, char: str):
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in "[{":
+            self._depth += 1
+        elif char in "]}" and self._depth > 0:
+            self._depth -= 1
+        elif char in ",}" and self._depth == 0:
+            value = json.loads("".join(self._buffer).strip())
+            self._state = "seek_key"
+            if char == "}":
+                self.done = True
+            return (self._key, value)
+        self._buffer.append(char)
+        return None
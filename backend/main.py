@@ -1,15 +1,49 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError
+import asyncio
+import contextlib
+import datetime
+import json
+import logging
+import time
 
-import models, schemas, crud, security, session_manager, ai_service
-from database import engine, SessionLocal
+import models, schemas, crud, security, session_manager, ai_service, word_io, srs, word_index, metrics, due_queue, migrate
+from database import AsyncSessionLocal, pool_stats
+from config import settings
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from cachetools import TLRUCache
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.db_create_schema_on_startup:
+        result = migrate.create_schema()
+        if result["duplicates"] or result["left_out_words"]:
+            # Without the unique index the bulk word inserts cannot run, so
+            # refuse to start, like migrate.py fails the release.
+            for owner_id, normalized, count in result["duplicates"]:
+                logger.error("User %s has %s words that normalize to %r", owner_id, count, normalized)
+            for word_id in result["left_out_words"]:
+                logger.error("Word %s duplicates another word of its user and has no normalized text", word_id)
+            raise RuntimeError(
+                f"Schema is incomplete: {migrate.UNIQUE_TEXT_INDEX} could not be created. "
+                "Merge or delete the duplicate words and restart, or run migrate.py for details."
+            )
+    # Builds each day's review queues in the background (see due_queue.py).
+    builder = asyncio.create_task(due_queue.run_scheduled_builds()) if settings.due_queue_schedule_enabled else None
+    yield
+    if builder is not None:
+        builder.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await builder
+
+app = FastAPI(lifespan=lifespan)
+# Routes time their handler for profiles (see metrics.TimedRoute).
+app.router.route_class = metrics.TimedRoute
 
 # --- CORS Middleware ---
 app.add_middleware(
@@ -18,33 +52,72 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# --- Metrics Middleware ---
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Records every request's latency, database queries and database time
+    under its route template. Requests sent with "X-Profile: 1" get the
+    breakdown back in a Server-Timing header.
+    """
+    profile = metrics.start_request()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - profile.start
+        # Label by route template, so ids in paths do not create new series.
+        route = request.scope.get("route")
+        labels = (request.method, route.path if route is not None else "unmatched")
+        metrics.http_requests.inc(*labels, status_code)
+        metrics.http_request_seconds.observe(*labels, value=elapsed)
+        metrics.http_request_db_queries.observe(*labels, value=profile.db_queries)
+        metrics.http_request_db_seconds.observe(*labels, value=profile.db_seconds)
+    if settings.metrics_profiling_header and request.headers.get("x-profile") == "1":
+        response.headers["Server-Timing"] = profile.server_timing(elapsed)
+    return response
+
 # This tells FastAPI which URL will be used to get the token.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified access tokens and the users they belong to, as (user, expires_at).
+# Each entry expires with its token (or sooner, see auth_user_cache_ttl_seconds),
+# so the hot path skips both the signature check and the user query.
+token_cache = TLRUCache(
+    maxsize=settings.auth_user_cache_size,
+    ttu=lambda token, entry, now: min(entry[1], now + settings.auth_user_cache_ttl_seconds),
+    timer=time.time,
+)
+
 # --- Dependency ---
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """
     Dependency to get the current user from a JWT token.
-    1. Decodes the token.
-    2. Validates the username from the token's payload.
-    3. Fetches the user from the database.
+    1. Returns the user straight from the token cache if this worker has
+       already verified the token and it has not expired.
+    2. Otherwise verifies the token and validates the username in its payload.
+    3. Fetches the user from the database and caches it for the token.
+    Returns a lightweight schemas.User (id and username), not the ORM row.
     """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[0]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+        payload = security.decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -52,11 +125,43 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = crud.get_user_by_username(db, username=token_data.username)
-    if user is None:
+    db_user = await crud.get_user_by_username(db, username=token_data.username)
+    if db_user is None:
         raise credentials_exception
+    user = schemas.User.model_validate(db_user, from_attributes=True)
+    token_cache[token] = (user, payload.get("exp", 0))
     return user
 
+def acquire_ai_slot(user_id: int):
+    """Reserves an AI slot for the user, or raises 429 if they have none left."""
+    if not ai_service.try_acquire_user_slot(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many AI requests in progress. Please wait for them to finish.",
+            headers={"Retry-After": "1"},
+        )
+
+async def get_ai_user(current_user: schemas.User = Depends(get_current_user)):
+    """
+    Dependency for AI endpoints. Reserves one of the user's in-flight AI slots
+    for the duration of the request, so a single user cannot monopolise the
+    worker's Gemini concurrency.
+    """
+    acquire_ai_slot(current_user.id)
+    try:
+        yield current_user
+    finally:
+        ai_service.release_user_slot(current_user.id)
+
+@app.exception_handler(security.PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: security.PasswordHashingBusy):
+    """Logins and sign-ups are shed with a 503 while the password hashing pool is full."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "The server is busy. Please try again shortly."},
+        headers={"Retry-After": str(settings.password_hash_retry_after_seconds)},
+    )
+
 
 @app.get("/")
 def read_root():
@@ -64,47 +169,107 @@ def read_root():
 
 
 @app.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # ... existing login code ...
-    user = crud.get_user_by_username(db, username=form_data.username)
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = await crud.get_user_by_username(db, username=form_data.username)
+    if user:
+        # bcrypt is deliberately slow, so verification runs in the hashing process pool.
+        valid, new_hash = await security.verify_password_async(form_data.password, user.hashed_password)
+    if not user or not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # The stored hash uses an outdated cost factor; the password is known
+        # to be right, so replace it while we have it.
+        await crud.update_user_password_hash(db, user, new_hash)
     
     access_token = security.create_access_token(
         data={"sub": user.username}
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = security.create_refresh_token(data={"sub": user.username})
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+@app.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(request: schemas.TokenRefresh, db: AsyncSession = Depends(get_db)):
+    """
+    Exchanges a refresh token for a new access token and a new refresh
+    token, so clients stay signed in without sending the password again.
+    Each refresh token works once: the one sent is revoked.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = security.decode_token(request.refresh_token, token_type="refresh")
+    except JWTError:
+        raise credentials_exception
+    # Tokens issued before rotation have no jti and cannot be revoked, so they are refused.
+    username, jti = payload.get("sub"), payload.get("jti")
+    if username is None or jti is None or await crud.get_user_by_username(db, username=username) is None:
+        raise credentials_exception
+    expires_at = datetime.datetime.fromtimestamp(payload["exp"], datetime.timezone.utc).replace(tzinfo=None)
+    if not await crud.revoke_refresh_token(db, jti, expires_at):
+        raise credentials_exception
+
+    return {
+        "access_token": security.create_access_token(data={"sub": username}),
+        "token_type": "bearer",
+        "refresh_token": security.create_refresh_token(data={"sub": username}),
+    }
+
+
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_refresh_token(request: schemas.TokenRefresh, db: AsyncSession = Depends(get_db)):
+    """
+    Revokes a refresh token, e.g. on logout, so it can no longer be
+    exchanged for new tokens. Access tokens already issued stay valid until
+    they expire. An invalid or expired token has nothing left to revoke.
+    """
+    try:
+        payload = security.decode_token(request.refresh_token, token_type="refresh")
+    except JWTError:
+        return
+    if payload.get("jti") is not None:
+        expires_at = datetime.datetime.fromtimestamp(payload["exp"], datetime.timezone.utc).replace(tzinfo=None)
+        await crud.revoke_refresh_token(db, payload["jti"], expires_at)
 
 
 @app.post("/users/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     # ... existing create_user code ...
-    db_user = crud.get_user_by_username(db, username=user.username)
+    db_user = await crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
 
-@app.get("/users/me/", response_model=schemas.User)
-async def read_users_me(current_user: schemas.User = Depends(get_current_user)):
+@app.get("/users/me/", response_model=schemas.UserProfile)
+async def read_users_me(
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
     """
-    A protected endpoint that returns the data of the currently logged-in user.
+    A protected endpoint that returns the profile of the currently logged-in
+    user, with vocabulary statistics instead of the full word list.
     """
-    return current_user
+    stats = await crud.get_user_word_stats(db, user_id=current_user.id, today=datetime.date.today())
+    return {**current_user.model_dump(), **stats}
 
 @app.post("/words/", response_model=schemas.Word, status_code=status.HTTP_201_CREATED)
-def create_word_for_user(
+async def create_word_for_user(
     word_request: schemas.WordCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -112,109 +277,444 @@ def create_word_for_user(
     confirmed the definition on the frontend.
     """
     # The AI call is no longer here. We just save the confirmed data.
-    return crud.create_user_word(db=db, word=word_request, user_id=current_user.id)
+    db_word = await crud.create_user_word(db=db, word=word_request, user_id=current_user.id)
+    if db_word is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This word is already in your vocabulary.")
+    return db_word
 
 
-@app.get("/words/", response_model=list[schemas.Word])
-def read_user_words(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db), 
+@app.post("/words/bulk", response_model=schemas.WordImportSummary)
+async def bulk_import_words(
+    request: Request,
+    batch_size: int = Query(settings.bulk_import_batch_size, ge=1, le=settings.bulk_import_max_batch_size),
+    format: str | None = Query(None, pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
-    Retrieves all vocabulary words for the currently logged-in user.
+    Imports many words at once from a streamed NDJSON or CSV body (with
+    "text" and "definition" fields/columns). The format comes from the
+    `format` parameter or the Content-Type header.
+
+    The body is parsed as it arrives and inserted in batches, so memory use
+    stays flat however large the upload is. Words the user already has are
+    skipped. The response counts created, duplicate and invalid rows, and
+    lists the rows that were not imported.
     """
-    words = crud.get_user_words(db, user_id=current_user.id, skip=skip, limit=limit)
-    return words
+    if format is None:
+        media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if media_type in word_io.NDJSON_MEDIA_TYPES:
+            format = "ndjson"
+        elif media_type in word_io.CSV_MEDIA_TYPES:
+            format = "csv"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Send the words as NDJSON (application/x-ndjson) or CSV (text/csv)."
+            )
 
-@app.get("/review/next/", response_model=schemas.Word)
-def get_next_review_word(
-    db: Session = Depends(get_db),
+    parse = word_io.iter_ndjson_records if format == "ndjson" else word_io.iter_csv_records
+    return await crud.import_user_words(
+        db,
+        user_id=current_user.id,
+        records=parse(request.stream(), settings.bulk_import_max_record_length),
+        batch_size=batch_size,
+        max_reported_rows=settings.bulk_import_max_reported_rows,
+    )
+
+@app.get("/words/export")
+async def export_user_words(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    updated_since: datetime.datetime | None = None,
     current_user: schemas.User = Depends(get_current_user)
 ):
+    """
+    Streams the user's whole vocabulary as NDJSON or CSV, optionally
+    gzip-compressed on the fly. With `updated_since`, only words created or
+    changed since then are exported, for incremental backups.
+    """
     user_id = current_user.id
-    
-    if user_id not in session_manager.active_sessions:
-        user_words = crud.get_user_words(db, user_id=user_id, limit=1000)
-        session_manager.active_sessions[user_id] = session_manager.UserSession(words=user_words)
 
-    session = session_manager.active_sessions[user_id]
-    next_word = session.get_next_word()
+    async def rows_as_text():
+        # The response outlives request dependencies, so it opens its own session.
+        async with AsyncSessionLocal() as db:
+            first = True
+            async for rows in crud.stream_user_words_for_export(
+                db, user_id=user_id, updated_since=updated_since, batch_size=settings.export_batch_size
+            ):
+                if format == "csv":
+                    yield word_io.format_csv(rows, header=first)
+                else:
+                    yield word_io.format_ndjson(rows)
+                first = False
+            if first and format == "csv":
+                # Still send the header for an empty export.
+                yield word_io.format_csv([], header=True)
+
+    filename = f"words.{format}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    body = rows_as_text()
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+        body = word_io.gzip_stream(body)
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/words/search", response_model=schemas.WordSearchResults)
+async def search_user_words(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=settings.word_search_max_results),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Searches the user's words, ignoring case and accents. Words starting
+    with `q` come first, followed by close matches, so typos still find
+    the word.
+    """
+    hits = await crud.search_user_words(db, user_id=current_user.id, query=q, limit=limit)
+    return {"items": hits}
+
+@app.get("/words/", response_model=schemas.WordPage)
+async def read_user_words(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str | None = None,
+    sort: str = Query("id", pattern="^-?(" + "|".join(crud.WORD_SORT_COLUMNS) + ")$"),
+    due_before: datetime.date | None = None,
+    min_difficulty: int | None = None,
+    max_difficulty: int | None = None,
+    prefix: str | None = None,
+    db: AsyncSession = Depends(get_db), 
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Retrieves a page of vocabulary words for the currently logged-in user.
+    Filters and sort order are applied by the database; pass the returned
+    next_cursor back to get the following page. `prefix` ignores case and
+    accents (see word_search.normalize_text).
+    """
+    after = None
+    if cursor:
+        try:
+            after = crud.decode_word_cursor(cursor, sort)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+    # Fetch one extra row to find out whether there is another page.
+    words = await crud.get_user_words(
+        db,
+        user_id=current_user.id,
+        limit=limit + 1,
+        sort=sort,
+        after=after,
+        due_before=due_before,
+        min_difficulty=min_difficulty,
+        max_difficulty=max_difficulty,
+        prefix=prefix,
+    )
+    next_cursor = None
+    if len(words) > limit:
+        words = words[:limit]
+        next_cursor = crud.encode_word_cursor(sort, words[-1])
+    return {"items": words, "next_cursor": next_cursor}
+
+@app.get("/review/next/", response_model=schemas.Word)
+async def get_next_review_word(
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    with metrics.span("session_manager"):
+        next_word = await session_manager.scheduler.get_next_word(db, user_id=current_user.id)
     if next_word is None:
-        # Clear the session when there are no more words for today
-        del session_manager.active_sessions[user_id]
         raise HTTPException(status_code=404, detail="No more words due for review today.")
-    
     return next_word
 
+@app.get("/review/forecast", response_model=schemas.ReviewForecast)
+async def forecast_reviews(
+    days: int = Query(7, ge=1, le=settings.review_forecast_max_days),
+    simulate: bool = False,
+    runs: int = Query(settings.review_simulation_default_runs, ge=1, le=settings.review_simulation_max_runs),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Forecasts how many reviews are due on each of the next `days` days.
+    With simulate=true, also projects the load from the user's past
+    accuracy, including the re-reviews that forgotten words will cause.
+    """
+    today = datetime.date.today()
+    until = today + datetime.timedelta(days=days - 1)
+    due = {today + datetime.timedelta(days=offset): 0 for offset in range(days)}
+    overdue = 0
+    for due_on, count in await crud.get_due_histogram(db, user_id=current_user.id, until=until):
+        if due_on < today:
+            overdue += count
+        due[max(due_on, today)] += count
+    forecast = [{"date": date, "due": count} for date, count in due.items()]
+
+    if simulate:
+        groups = await crud.get_review_state_groups(
+            db, user_id=current_user.id, until=until, columns=srs.SIMULATION_COLUMNS[settings.srs_algorithm]
+        )
+        # The simulation is CPU-bound NumPy work; keep it off the event loop.
+        projected = await asyncio.to_thread(
+            srs.forecast_workload,
+            groups,
+            today,
+            days,
+            runs,
+            settings.srs_algorithm,
+            srs.params_from_settings(settings),
+            settings.review_simulation_prior_accuracy,
+        )
+        for day, projection in zip(forecast, projected):
+            day.update(projection)
+
+    return {"days": forecast, "overdue": overdue, "simulation_runs": runs if simulate else None}
+
+# Declared before /review/{word_id} so "batch" is not taken for a word id.
+@app.post("/review/batch", response_model=schemas.ReviewBatchResponse)
+async def submit_review_batch(
+    batch: schemas.ReviewBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Submits many review answers at once, e.g. from a client that reviewed
+    offline. Safe to retry: answers that were already applied are skipped.
+    """
+    if len(batch.answers) > settings.review_batch_max_answers:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {settings.review_batch_max_answers} answers."
+        )
+    results = await session_manager.scheduler.record_review_batch(db, user_id=current_user.id, answers=batch.answers)
+    return {"results": results}
+
 @app.post("/review/{word_id}", response_model=schemas.Word)
-def submit_review_for_word(
+async def submit_review_for_word(
     word_id: int,
     result: schemas.ReviewResult,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    user_id = current_user.id
-    if user_id not in session_manager.active_sessions:
-        raise HTTPException(status_code=400, detail="No active review session. Please get the next word first.")
-        
-    session = session_manager.active_sessions[user_id]
-    word_to_update = session.word_db.get(word_id)
-
-    if not word_to_update:
-        raise HTTPException(status_code=404, detail="Word not found in current review session.")
-
-    session.update_word_review(word_to_update, result.was_correct)
-    
-    updated_word_db = crud.update_word_review_status(
+    updated_word_db = await session_manager.scheduler.record_review(
         db,
+        user_id=current_user.id,
         word_id=word_id,
-        user_id=user_id,
-        new_date=word_to_update.next_review_due,
-        new_difficulty=word_to_update.difficulty
+        was_correct=result.was_correct
     )
-    
+    if updated_word_db is None:
+        raise HTTPException(status_code=404, detail="Word not found.")
     return updated_word_db
 
 # --- AI Endpoints ---
 @app.post("/ai/generate-details/", response_model=schemas.AIWordDetailResponse)
-def generate_ai_details(
+async def generate_ai_details(
     request: schemas.AIWordDetailRequest,
-    current_user: schemas.User = Depends(get_current_user)
+    current_user: schemas.User = Depends(get_ai_user)
 ):
     """
     Takes a word and returns an AI-generated definition and example sentence.
     """
-    details = ai_service.get_ai_word_details(request.word_text)
+    details = await ai_service.get_ai_word_details(request.word_text)
     return details
 
 @app.post("/ai/explain-word/", response_model=schemas.AIWordExplanation)
-def explain_word_with_ai(
+async def explain_word_with_ai(
     request: schemas.AIWordDetailRequest,
-    current_user: schemas.User = Depends(get_current_user)
+    current_user: schemas.User = Depends(get_ai_user)
 ):
     """
     Takes a word and returns a comprehensive AI-generated explanation
     including a definition, example, and mnemonic. Does NOT save the word.
     """
-    explanation = ai_service.get_ai_word_explanation(request.word_text)
+    explanation = await ai_service.get_ai_word_explanation(request.word_text)
     return explanation
 
+@app.post("/ai/explain-words/", response_model=schemas.AIBatchExplainResponse)
+async def explain_words_with_ai(
+    request: schemas.AIBatchExplainRequest,
+    current_user: schemas.User = Depends(get_ai_user)
+):
+    """
+    Takes a list of words and returns an AI-generated explanation for each,
+    using as few Gemini calls as possible. Does NOT save the words.
+    """
+    if len(request.words) > settings.ai_batch_max_words:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {settings.ai_batch_max_words} words."
+        )
+    explanations, failed = await ai_service.get_ai_word_explanations(request.words)
+    return {
+        "results": [
+            {"word_text": word, "explanation": explanation}
+            for word, explanation in explanations.items()
+        ],
+        "failed": failed,
+    }
+
 # NEW ENDPOINT for regenerating explanations
 @app.post("/ai/regenerate-explanation/", response_model=schemas.AIRegenerateResponse)
-def regenerate_ai_explanation(request: schemas.AIRegenerateRequest, current_user: schemas.User = Depends(get_current_user)):
-    alt_details = ai_service.get_alternative_explanation(
+async def regenerate_ai_explanation(request: schemas.AIRegenerateRequest, current_user: schemas.User = Depends(get_ai_user)):
+    alt_details = await ai_service.get_alternative_explanation(
         word=request.word_text,
         previous_example=request.previous_example,
         previous_mnemonic=request.previous_mnemonic
     )
     return alt_details
 
+# --- Streaming AI Endpoints (Server-Sent Events) ---
+class _AISlotStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that releases the user's AI slot once it has been
+    sent, however that ends: finished, failed, or with the client gone
+    before the body iterator ever ran.
+    """
+    def __init__(self, content, user_id: int, **kwargs):
+        super().__init__(content, **kwargs)
+        self.user_id = user_id
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            ai_service.release_user_slot(self.user_id)
+
+
+def _sse_response(fields, user_id: int) -> StreamingResponse:
+    """
+    Wraps an async iterator of (field, value) pairs in a Server-Sent Events
+    response: one event per field, named after it, followed by a "done" event.
+    The user's AI slot is held until the response is over.
+    """
+    async def event_stream():
+        async for field, value in fields:
+            yield f"event: {field}\ndata: {json.dumps(value)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return _AISlotStreamingResponse(
+        event_stream(),
+        user_id,
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream, which would defeat the point.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/ai/explain-word/stream")
+async def stream_word_explanation(
+    request: schemas.AIWordDetailRequest,
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Streaming version of /ai/explain-word/. Sends "definition", "example"
+    and "mnemonic" events as soon as each one has been generated.
+    """
+    # Streaming responses outlive their dependencies, so the slot is taken
+    # here and released by the response once it is over rather than by get_ai_user.
+    acquire_ai_slot(current_user.id)
+    return _sse_response(ai_service.stream_ai_word_explanation(request.word_text), current_user.id)
+
+@app.post("/ai/regenerate-explanation/stream")
+async def stream_regenerated_explanation(
+    request: schemas.AIRegenerateRequest,
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Streaming version of /ai/regenerate-explanation/. Sends "example" and
+    then "mnemonic" events as soon as each one has been generated.
+    """
+    # Streaming responses outlive their dependencies, so the slot is taken
+    # here and released by the response once it is over rather than by get_ai_user.
+    acquire_ai_slot(current_user.id)
+    fields = ai_service.stream_alternative_explanation(
+        word=request.word_text,
+        previous_example=request.previous_example,
+        previous_mnemonic=request.previous_mnemonic
+    )
+    return _sse_response(fields, current_user.id)
+
 @app.get("/ai/suggest-words/", response_model=schemas.AISuggestionResponse)
-def suggest_words_with_ai(db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    user_words = crud.get_user_words(db, user_id=current_user.id, limit=10)
-    existing_word_texts = [word.text for word in user_words]
-    suggestions = ai_service.get_ai_word_suggestions(existing_words=existing_word_texts)
-    return suggestions
\ No newline at end of file
+async def suggest_words_with_ai(db: AsyncSession = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
+    """
+    Suggests new words close to the user's whole vocabulary, from the local
+    embedding index. Gemini is only asked when the index is not available.
+    """
+    # The first check opens the index files, so it runs in a thread.
+    if await asyncio.to_thread(lambda: word_index.index.available):
+        known_rows = await crud.get_known_word_rows(db, user_id=current_user.id)
+        suggestions = await asyncio.to_thread(
+            word_index.index.suggest_near, known_rows, settings.word_suggestion_count
+        )
+        if suggestions:
+            return {"suggestions": suggestions}
+
+    # The prompt only has room for a sample of the vocabulary: the words added last.
+    recent_words = await crud.get_recent_word_texts(
+        db, user_id=current_user.id, limit=settings.word_suggestion_fallback_sample
+    )
+    # The AI slot is only needed for the fallback, so it is taken here rather than by get_ai_user.
+    acquire_ai_slot(current_user.id)
+    try:
+        return await ai_service.get_ai_word_suggestions(existing_words=recent_words)
+    finally:
+        ai_service.release_user_slot(current_user.id)
+
+@app.get("/stats/db-pool/")
+async def get_db_pool_stats(current_user: schemas.User = Depends(get_current_user)):
+    """
+    Returns the connection pool state and checkout/wait statistics of this worker.
+    """
+    return pool_stats()
+
+def _runtime_metrics():
+    """Numbers other modules already keep, reported at scrape time."""
+    ai_stats = ai_service.stats()
+    for name in ("memory_hits", "db_hits", "misses", "writes", "evictions", "errors"):
+        label = name.replace("_", " ")
+        yield f"ai_cache_{name}_total", "counter", f"AI response cache {label}.", ai_stats["cache"][name]
+    yield "ai_cache_hit_ratio", "gauge", "Share of AI cache lookups answered from either tier.", ai_stats["cache"]["hit_rate"]
+    yield "ai_upstream_calls_total", "counter", "AI lookups that ran.", ai_stats["coalescing"]["upstream_calls"]
+    yield "ai_coalesced_calls_total", "counter", "AI lookups that shared one already running.", ai_stats["coalescing"]["coalesced_calls"]
+    yield "ai_lookups_in_flight", "gauge", "AI lookups running now.", ai_stats["coalescing"]["in_flight"]
+    yield "ai_circuit_open", "gauge", "1 while the Gemini circuit breaker is open.", int(ai_stats["circuit"]["state"] == "open")
+    yield "ai_circuit_opened_total", "counter", "Times the Gemini circuit breaker opened.", ai_stats["circuit"]["opened"]
+    yield "ai_circuit_rejected_total", "counter", "Gemini calls refused while the circuit was open.", ai_stats["circuit"]["rejected"]
+    yield "ai_retries_total", "counter", "Gemini calls retried.", ai_stats["retries"]["retries"]
+    yield "ai_retry_budget_exhausted_total", "counter", "Gemini retries refused by the retry budget.", ai_stats["retries"]["exhausted"]
+    pool = pool_stats()["async"]
+    for name, key, kind, help_text in (
+        ("db_pool_checked_out", "checked_out", "gauge", "Database connections in use."),
+        ("db_pool_checkouts_total", "checkouts", "counter", "Database connection checkouts."),
+        ("db_pool_timeouts_total", "timeouts", "counter", "Database connection checkouts that timed out."),
+        ("db_pool_wait_seconds_total", "wait_seconds_total", "counter", "Time spent waiting for a database connection."),
+    ):
+        if key in pool:
+            yield name, kind, help_text, pool[key]
+    yield "auth_token_cache_size", "gauge", "Verified access tokens cached.", len(token_cache)
+
+metrics.registry.add_collector(_runtime_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Returns this worker's request, database and AI metrics in the Prometheus
+    text format.
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ai/stats/")
+async def get_ai_stats(current_user: schemas.User = Depends(get_current_user)):
+    """
+    Returns the AI response cache hit/miss counters, the request coalescing
+    counters and the Gemini circuit breaker and retry state of this worker.
+    """
+    return ai_service.stats()
@@ -0,0 +1,281 @@
+"""
+Request, database and LLM instrumentation, exposed in the Prometheus text
+format at /metrics.
+
+Each request gets a RequestProfile in a context variable. The SQLAlchemy
+hooks below, the Gemini wrapper in ai_service and span() add to the profile
+of whichever request they run in. The HTTP middleware in main.py turns the
+profile into per-route histograms, and into a Server-Timing header for
+clients that ask for one with "X-Profile: 1".
+
+Metrics are kept per worker process. Scrape every worker (or run a single
+one) to see them all.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Latency buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count, per combination of label values."""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name + _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, plus their sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # Per label values: [count per bucket (not cumulative)..., sum, count]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value: float):
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for label_values, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket" + _format_labels(self.labels, label_values, le), cumulative
+            yield f"{self.name}_sum" + _format_labels(self.labels, label_values), state[-2]
+            yield f"{self.name}_count" + _format_labels(self.labels, label_values), state[-1]
+
+
+class Registry:
+    """
+    The metrics of this worker. Collectors are callables run at scrape time
+    that return (name, kind, help, value) tuples, for numbers other modules
+    already keep (cache counters, pool state).
+    """
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {_format_value(value)}" for sample, value in metric.samples())
+        for collector in self.collectors:
+            for name, kind, help_text, value in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")
+)
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Time until the response starts, by route.", ("method", "route")
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries", "Database queries per request, by route.", ("method", "route"), COUNT_BUCKETS
+)
+http_request_db_seconds = registry.histogram(
+    "http_request_db_seconds", "Time spent in database queries per request, by route.", ("method", "route")
+)
+db_query_seconds = registry.histogram("db_query_duration_seconds", "Duration of single database queries.",
+                                      buckets=QUERY_BUCKETS)
+llm_request_seconds = registry.histogram(
+    "llm_request_duration_seconds", "Duration of Gemini calls, by operation and outcome.", ("operation", "outcome")
+)
+llm_tokens = registry.counter("llm_tokens_total", "Gemini tokens used, by operation and kind.", ("operation", "kind"))
+llm_parse_failures = registry.counter(
+    "llm_parse_failures_total", "Gemini replies that could not be parsed or validated.", ("operation",)
+)
+
+
+# --- Per-request profiles ---
+
+class RequestProfile:
+    """Where the time of one request went."""
+    __slots__ = ("start", "db_queries", "db_seconds", "llm_calls", "llm_seconds", "spans")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.spans: dict[str, float] = {}
+
+    def server_timing(self, total_seconds: float) -> str:
+        """The profile as a Server-Timing header value (durations in ms)."""
+        entries = [
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_queries} queries"',
+            f'llm;dur={self.llm_seconds * 1000:.2f};desc="{self.llm_calls} calls"',
+        ]
+        entries.extend(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items())
+        entries.append(f"total;dur={total_seconds * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_profile: contextvars.ContextVar[RequestProfile | None] = contextvars.ContextVar("request_profile", default=None)
+
+
+def start_request() -> RequestProfile:
+    """Starts a profile for the current request (and the tasks it spawns)."""
+    profile = RequestProfile()
+    _profile.set(profile)
+    return profile
+
+
+def current_profile() -> RequestProfile | None:
+    return _profile.get()
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Adds the time spent in the block to the current request's profile under `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile = _profile.get()
+        if profile is not None:
+            profile.spans[name] = profile.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def record_llm_call(operation: str, outcome: str, seconds: float, usage=None):
+    """Records one Gemini call; `usage` is the response's usage_metadata, if any."""
+    llm_request_seconds.observe(operation, outcome, value=seconds)
+    profile = _profile.get()
+    if profile is not None:
+        profile.llm_calls += 1
+        profile.llm_seconds += seconds
+    if usage is not None:
+        llm_tokens.inc(operation, "prompt", amount=getattr(usage, "prompt_token_count", 0) or 0)
+        llm_tokens.inc(operation, "completion", amount=getattr(usage, "candidates_token_count", 0) or 0)
+
+
+class TimedRoute(APIRoute):
+    """
+    A route that times its endpoint function as the "handler" span, so a
+    profile separates the handler from dependencies, validation and
+    serialization (the rest of the total).
+    """
+    def get_route_handler(self):
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed(*args, **kwargs):
+                with span("handler"):
+                    return await call(*args, **kwargs)
+        else:
+            @functools.wraps(call)
+            def timed(*args, **kwargs):
+                with span("handler"):
+                    return call(*args, **kwargs)
+        self.dependant.call = timed
+        return super().get_route_handler()
+
+
+# --- Database hooks ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_times"].pop()
+    db_query_seconds.observe(value=elapsed)
+    profile = _profile.get()
+    if profile is not None:
+        profile.db_queries += 1
+        profile.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # A failed query never reaches after_cursor_execute.
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_times"):
+        connection.info["query_start_times"].pop()
+
+
+def instrument_engine(engine):
+    """Times every query run through a (sync) engine; pass async_engine.sync_engine for async ones."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,128 @@
+"""
+Brings the database schema up to date with models.py. Safe to run any
+number of times:
+
+1. Creates missing tables.
+2. Adds columns that models.py has but an existing table lacks (tables
+   created by an older version keep their old columns otherwise, since
+   create_all never alters a table). Existing rows get the column's default.
+3. Fills in normalized_text for words that do not have it yet (see
+   word_search.backfill_normalized_text).
+4. Sets updated_at on words that predate it to the time of the migration,
+   so the next incremental export includes them once.
+5. Creates missing indexes, including those on the added columns. The
+   unique (owner_id, normalized_text) index is skipped while a user has the
+   same normalized word twice; those duplicates are reported instead.
+
+Run it once per deploy, before the workers start (the Procfile's release
+step does this):
+
+    python migrate.py
+
+It exits with an error, failing the release, if duplicate words keep it
+from finishing.
+
+For local development the app also does it on startup, unless
+DB_CREATE_SCHEMA_ON_STARTUP is false, and refuses to start in the same case.
+"""
+import datetime
+import sys
+import time
+
+from sqlalchemy import inspect, text, update
+
+import models
+import word_search
+from database import engine
+
+UNIQUE_TEXT_INDEX = "ux_words_owner_id_normalized_text"
+
+
+def _column_ddl(column, dialect) -> str:
+    """The column definition for ALTER TABLE ... ADD COLUMN, with its default for existing rows."""
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar:
+        literal = column.type.literal_processor(dialect)
+        ddl += f" DEFAULT {literal(default.arg) if literal else default.arg}"
+    return ddl
+
+
+def _add_missing_columns(conn) -> list[str]:
+    """Adds the columns missing from existing tables; returns them as "table.column"."""
+    inspector = inspect(conn)
+    added = []
+    for table in models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, conn.dialect)}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _backfill_updated_at(conn) -> int:
+    """Sets updated_at where it is missing; returns the number of words changed."""
+    table = models.Word.__table__
+    result = conn.execute(
+        update(table).where(table.c.updated_at.is_(None)).values(updated_at=datetime.datetime.utcnow())
+    )
+    return result.rowcount
+
+
+def _create_indexes(conn, skip: set[str]):
+    if conn.dialect.name == "postgresql":
+        # The trigram index on words needs these (see models.py).
+        for extension in ("pg_trgm", "btree_gin"):
+            conn.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in skip:
+                index.create(conn, checkfirst=True)
+
+
+def create_schema() -> dict:
+    """
+    Runs the steps above. Returns the columns added ("table.column"), the
+    number of words normalized, the number given an updated_at, the ids of words left without normalized
+    text because they duplicate another, and the duplicates that kept the
+    unique index from being created, as (owner_id, normalized_text, count).
+    """
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        added = _add_missing_columns(conn)
+    with engine.begin() as conn:
+        normalized, left_out = word_search.backfill_normalized_text(conn)
+    with engine.begin() as conn:
+        timestamped = _backfill_updated_at(conn)
+    with engine.begin() as conn:
+        duplicates = word_search.find_duplicate_words(conn)
+        _create_indexes(conn, skip={UNIQUE_TEXT_INDEX} if duplicates else set())
+    return {"added_columns": added, "normalized_words": normalized,
+            "timestamped_words": timestamped, "left_out_words": left_out, "duplicates": duplicates}
+
+
+def main():
+    start = time.perf_counter()
+    result = create_schema()
+    for column in result["added_columns"]:
+        print(f"Added column {column}")
+    if result["normalized_words"]:
+        print(f"Normalized the text of {result['normalized_words']} words")
+    if result["timestamped_words"]:
+        print(f"Set updated_at on {result['timestamped_words']} words")
+    for word_id in result["left_out_words"]:
+        print(f"Word {word_id} duplicates another word of its user and was left without normalized text")
+    for owner_id, normalized, count in result["duplicates"]:
+        print(f"User {owner_id} has {count} words that normalize to {normalized!r}")
+    if result["duplicates"] or result["left_out_words"]:
+        # Fail the release step: bulk imports rely on the unique index.
+        sys.exit("Schema is incomplete: merge or delete the duplicate words above and run this again.")
+    print(f"Schema is up to date ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Text, Date, DateTime, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
+import datetime
 
 from database import Base # Import the Base from our database.py
 
@@ -17,9 +18,96 @@ class Word(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String, index=True)
+    # word_search.normalize_text(text): unique per user, and what search matches on.
+    # Byte-order collation on PostgreSQL keeps prefix range scans exact.
+    normalized_text = Column(String().with_variant(String(collation="C"), "postgresql"))
     definition = Column(String)
     difficulty = Column(Integer, default=1)
     next_review_due = Column(Date)
+    # When the word was last created or changed; drives incremental exports.
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # When the latest applied review was answered (UTC). Replayed or
+    # out-of-order review submissions at or before this time are ignored.
+    last_reviewed_at = Column(DateTime, nullable=True)
+
+    # Review state used by the SRS engine (see srs.py). NULL means "new card".
+    interval_days = Column(Integer, default=0)
+    ease_factor = Column(Float, default=2.5)
+    repetitions = Column(Integer, default=0)
+    stability = Column(Float, nullable=True)
+    reviews = Column(Integer, default=0)
+    lapses = Column(Integer, default=0)
     
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="words")
+
+    __table_args__ = (
+        # Serves word listings: a user's words in id order.
+        Index("ix_words_owner_id_id", "owner_id", "id"),
+        # Serves the review queue: a user's due words in (date, id) order.
+        Index("ix_words_owner_id_next_review_due", "owner_id", "next_review_due"),
+        # Serves incremental exports: a user's words changed since a point in time.
+        Index("ix_words_owner_id_updated_at", "owner_id", "updated_at"),
+        # One word per normalized text and user; also serves prefix search.
+        Index("ux_words_owner_id_normalized_text", "owner_id", "normalized_text", unique=True),
+        # Serves typo-tolerant search on PostgreSQL (other databases use an in-process index).
+        Index(
+            "ix_words_owner_id_normalized_text_trgm",
+            "owner_id",
+            "normalized_text",
+            postgresql_using="gin",
+            postgresql_ops={"normalized_text": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+# The trigram index needs pg_trgm, and btree_gin to include owner_id in it.
+for _extension in ("pg_trgm", "btree_gin"):
+    event.listen(
+        Word.__table__,
+        "before_create",
+        DDL(f"CREATE EXTENSION IF NOT EXISTS {_extension}").execute_if(dialect="postgresql"),
+    )
+
+class DueQueueEntry(Base):
+    """
+    One slot of a user's review queue for a day, built ahead of time by
+    due_queue.py. The queue is a snapshot: word_id has no foreign key, and
+    readers join to words to skip words that were reviewed or removed since.
+    """
+    __tablename__ = "due_queue"
+
+    owner_id = Column(Integer, primary_key=True)
+    due_on = Column(Date, primary_key=True)
+    # 1-based, in (next_review_due, id) order as of the build.
+    position = Column(Integer, primary_key=True)
+    word_id = Column(Integer, nullable=False)
+
+class DueQueueBuild(Base):
+    __tablename__ = "due_queue_builds"
+
+    # The day the queues were built for. Inserting the row claims the build,
+    # so only one worker or job builds each day.
+    due_on = Column(Date, primary_key=True)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    users = Column(Integer, default=0)
+    words = Column(Integer, default=0)
+
+class RevokedRefreshToken(Base):
+    __tablename__ = "revoked_refresh_tokens"
+
+    # The token's "jti" claim. A refresh token is listed here once it has been
+    # exchanged at /token/refresh or revoked at logout, and is refused after.
+    jti = Column(String, primary_key=True)
+    # When the token expires anyway; the row can be dropped after that.
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class AICacheEntry(Base):
+    __tablename__ = "ai_cache"
+
+    # Cache key, e.g. "explanation:ubiquitous"
+    key = Column(String, primary_key=True)
+    # The JSON payload returned by the AI service
+    value = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
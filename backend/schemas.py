@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, datetime
 
 # --- Word Schemas ---
 # Base schema for a word, contains fields common to creating and reading.
@@ -18,6 +18,7 @@ class Word(WordBase):
     id: int
     owner_id: int
     difficulty: int
+    next_review_due: date | None = None
 
     # This tells Pydantic to read the data even if it is not a dict,
     # but an ORM model (or any other arbitrary object with attributes).
@@ -25,6 +26,37 @@ class Word(WordBase):
         orm_mode = True
 
 
+# A page of words. Pass next_cursor back as `cursor` to get the next page;
+# it is None on the last page.
+class WordPage(BaseModel):
+    items: list[Word]
+    next_cursor: str | None = None
+
+
+class WordSearchHit(BaseModel):
+    word: Word
+    match: str  # "prefix" or "fuzzy"
+    score: float | None = None  # trigram similarity, for fuzzy matches
+
+class WordSearchResults(BaseModel):
+    items: list[WordSearchHit]
+
+# A row of a bulk import that was not imported, and why.
+class WordImportRow(BaseModel):
+    row: int
+    text: str | None = None
+    status: str  # "duplicate" or "invalid"
+    error: str | None = None
+
+class WordImportSummary(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    rows: list[WordImportRow]
+    # True if more rows were skipped than could be listed in `rows`.
+    rows_truncated: bool
+
+
 # --- User Schemas ---
 # Base schema for a user.
 class UserBase(BaseModel):
@@ -35,14 +67,20 @@ class UserCreate(UserBase):
     password: str
 
 # Schema for reading a user from the API.
-# It should NOT include the password. It will include the user's words.
+# It should NOT include the password, nor the user's words (which can be
+# thousands of rows); use GET /words/ for those.
 class User(UserBase):
     id: int
-    words: list[Word] = []
 
     class Config:
         orm_mode = True
 
+# The current user's profile, with aggregate statistics about their words.
+class UserProfile(User):
+    total_words: int
+    due_today: int
+    mean_difficulty: float | None = None
+
 # --- Token Schemas ---
 # This defines the shape of the response when a user logs in.
 class Token(BaseModel):
@@ -57,6 +95,10 @@ class TokenData(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: str | None = None
@@ -66,6 +108,37 @@ class TokenData(BaseModel):
 class ReviewResult(BaseModel):
     was_correct: bool
 
+# A review answered on the client, possibly while offline.
+class ReviewAnswer(BaseModel):
+    word_id: int
+    was_correct: bool
+    answered_at: datetime
+
+class ReviewBatchRequest(BaseModel):
+    answers: list[ReviewAnswer]
+
+class ReviewAnswerResult(BaseModel):
+    word_id: int
+    answered_at: datetime
+    status: str  # "applied", "skipped" (already applied or outdated) or "not_found"
+
+class ReviewBatchResponse(BaseModel):
+    results: list[ReviewAnswerResult]  # one per answer, in the order they were sent
+
+class ReviewForecastDay(BaseModel):
+    date: date
+    due: int  # words currently scheduled for this day (overdue ones count towards today)
+    # Filled in by the simulation: mean, 10th and 90th percentile of the reviews
+    # expected that day, including re-reviews caused by earlier answers.
+    expected: float | None = None
+    low: float | None = None
+    high: float | None = None
+
+class ReviewForecast(BaseModel):
+    days: list[ReviewForecastDay]
+    overdue: int
+    simulation_runs: int | None = None
+
 class AIWordDetailRequest(BaseModel):
     word_text: str
 
@@ -78,6 +151,19 @@ class AIWordExplanation(BaseModel):
     example: str
     mnemonic: str
 
+class AIBatchExplainRequest(BaseModel):
+    words: list[str]
+
+class AIBatchExplanationItem(BaseModel):
+    word_text: str
+    # The offline dictionary's entry or a canned text if the word is in `failed`.
+    explanation: AIWordExplanation | None = None
+
+class AIBatchExplainResponse(BaseModel):
+    results: list[AIBatchExplanationItem]
+    # Words the AI could not explain.
+    failed: list[str]
+
 class AIRegenerateRequest(BaseModel):
     word_text: str
     previous_example: str
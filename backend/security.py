@@ -1,15 +1,32 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import asyncio
+import multiprocessing
+import os
+import threading
+import uuid
+
+from config import settings
 
 # --- Password Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Every bcrypt hash is expected to use the configured cost factor: pinning the
+# minimum and maximum to it makes needs_update() flag hashes made with any
+# other cost, so they are upgraded (or downgraded) at the next login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
 
 # --- JWT Configuration ---
-# These should be stored as environment variables in a real application
-SECRET_KEY = "a_very_secret_key_that_should_be_in_a_env_file"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+SECRET_KEY = settings.jwt_secret_key
+ALGORITHM = settings.jwt_algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+REFRESH_TOKEN_EXPIRE_DAYS = settings.refresh_token_expire_days
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -17,6 +34,79 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    """
+    Checks a password and, if the stored hash is out of date, rehashes it.
+    Returns (valid, new_hash), where new_hash is None unless it should be
+    stored in place of the old one.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# --- Password hashing pool ---
+# bcrypt is deliberately slow and holds the GIL for most of its run, so a
+# thread would still stall the worker. Hashes are computed in a small pool of
+# processes instead, and once that pool has as many jobs as it may queue,
+# further logins and sign-ups are refused (503) rather than left to pile up
+# behind it while every other request waits.
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing pool has no room for another job."""
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+# Jobs submitted to the pool that have not finished yet (running or queued).
+_pending = 0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the worker already runs threads
+            # (the event loop's executor, database drivers) that fork would
+            # copy in whatever state they happen to be in.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_processes or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+async def _run_in_pool(function, *args):
+    global _pending
+    limit = (settings.password_hash_processes or os.cpu_count() or 1) + settings.password_hash_max_queue
+    if _pending >= limit:
+        raise PasswordHashingBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), function, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hashes a password in the hashing pool. Raises PasswordHashingBusy if it is full."""
+    return await _run_in_pool(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verifies a password in the hashing pool, like verify_and_update_password().
+    Raises PasswordHashingBusy if the pool is full.
+    """
+    return await _run_in_pool(verify_and_update_password, plain_password, hashed_password)
+
+
+def shutdown_pool():
+    """Stops the hashing processes; the pool is started again on next use."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
 def create_access_token(data: dict):
     """
     Creates a new JWT access token.
@@ -27,3 +117,26 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(data: dict):
+    """
+    Creates a long-lived refresh token, which can only be exchanged for new
+    tokens at /token/refresh and is not accepted as an access token. Its
+    unique "jti" claim lets it be used once and revoked (see
+    crud.revoke_refresh_token).
+    """
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    """
+    Verifies a token's signature and expiry and returns its payload.
+    Raises JWTError if it is invalid, expired or not of the given type
+    (access tokens carry no type claim).
+    """
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if payload.get("type", "access") != token_type:
+        raise JWTError(f"Not an {token_type} token")
+    return payload
+
@@ -1,51 +1,160 @@
-import heapq
 import datetime
-from typing import Dict, List
-import schemas
+import threading
 
-class UserSession:
+from cachetools import TTLCache
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud, models, schemas, srs
+from config import settings
+
+
+def _as_utc(moment: datetime.datetime) -> datetime.datetime:
+    """Converts a datetime to naive UTC, the form stored in the database."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+# Row fields the SRS engine reads from a stored word.
+_REVIEW_FIELDS = ("id", "last_reviewed_at", *srs.STATE_COLUMNS)
+_srs_params = srs.params_from_settings(settings)
+
+
+class ReviewScheduler:
     """
-    Manages the in-memory data for a single user's review session.
+    Serves each user's due words straight from the database, in two phases:
+
+    1. The user's due queue for today, precomputed by due_queue.py, in queue
+       order: a range read on the queue's primary key.
+    2. Then the due words that are not in the queue (added or rescheduled
+       after it was built, or beyond its size limit), in (next_review_due,
+       id) order, using the (owner_id, next_review_due) index. Without a
+       queue for today this serves every due word, as phase 1 finds nothing.
+
+    The only in-memory state is a per-user cursor: the phase, the day and
+    the position (or (next_review_due, id)) of the last word handed out.
+    Cursors live in a bounded TTL cache, so memory stays flat no matter how
+    many users review. Losing a cursor (eviction, restart, or a request
+    landing on another Gunicorn worker) is harmless: reviewed words are no
+    longer due, so the queries simply start from the first word still due today.
     """
-    def __init__(self, words: List[schemas.Word]):
-        # The Hash Table for O(1) lookups
-        self.word_db: Dict[int, schemas.Word] = {word.id: word for word in words}
-        
-        # The Priority Queue for SRS scheduling. We store tuples of (next_review_date, word_id).
-        self.review_queue = []
-        for word in words:
-            if word.next_review_due <= datetime.date.today():
-                heapq.heappush(self.review_queue, (word.next_review_due, word.id))
-
-    def get_next_word(self) -> schemas.Word | None:
-        """Pops the next due word from the queue."""
-        if not self.review_queue:
+    def __init__(self, max_cursors: int, cursor_ttl_seconds: int):
+        self._cursors = TTLCache(maxsize=max_cursors, ttl=cursor_ttl_seconds)
+        self._lock = threading.Lock()
+
+    async def get_next_word(self, db: AsyncSession, user_id: int) -> models.Word | None:
+        """
+        Returns the next due word after the user's cursor and advances it.
+        Returns None (and resets the cursor) once nothing is left for today.
+        """
+        today = datetime.date.today()
+        with self._lock:
+            cursor = self._cursors.get(user_id)
+        if cursor is None or cursor[1] != today:
+            cursor = ("queue", today, 0)
+
+        if cursor[0] == "queue":
+            queued = await crud.get_queued_due_words(db, user_id=user_id, due_on=today, after_position=cursor[2], limit=1)
+            if queued:
+                position, next_word = queued[0]
+                with self._lock:
+                    self._cursors[user_id] = ("queue", today, position)
+                return next_word
+            # Words the queue served are skipped from here on. If it served
+            # none, every queued word is already reviewed (or there is no queue).
+            cursor = ("due", today, None, cursor[2] > 0)
+
+        words = await crud.get_due_words(
+            db, user_id=user_id, due_on=today, after=cursor[2], limit=1, exclude_queued=cursor[3]
+        )
+        if not words:
+            # End of today's queue. Anything skipped is served again next time.
+            self.reset(user_id)
             return None
-        
-        _ , word_id = heapq.heappop(self.review_queue)
-        return self.word_db.get(word_id)
-
-    def update_word_review(self, word: schemas.Word, was_correct: bool):
-        """Calculates the next review date and pushes the word back into the queue."""
-        # A simple SRS algorithm:
-        # If correct, double the interval (up to a max). If wrong, reset it.
-        if was_correct:
-            # Difficulty acts as a multiplier. More difficult words get reviewed sooner.
-            interval_days = (2 ** (8 - word.difficulty))
-            if word.difficulty > 1:
-                word.difficulty -= 1 # Word gets easier
-        else:
-            interval_days = 1 # Reset review to tomorrow
-            if word.difficulty < 10:
-                word.difficulty += 1 # Word gets harder
-
-        word.next_review_due = datetime.date.today() + datetime.timedelta(days=interval_days)
-        
-        # We don't push it back into the queue for today's session
-        # but the main word_db is updated for the next session.
-        self.word_db[word.id] = word
-
-
-# A simple in-memory dictionary to hold active sessions.
-# Key: user_id, Value: UserSession object
-active_sessions: Dict[int, UserSession] = {}
+
+        next_word = words[0]
+        with self._lock:
+            self._cursors[user_id] = ("due", today, (next_word.next_review_due, next_word.id), cursor[3])
+        return next_word
+
+    async def record_review(self, db: AsyncSession, user_id: int, word_id: int, was_correct: bool) -> models.Word | None:
+        """
+        Applies a review result to one of the user's words and saves it.
+        Returns the updated word, or None if the user has no such word.
+        """
+        db_word = await crud.get_user_word(db, word_id=word_id, user_id=user_id)
+        if db_word is None:
+            return None
+        row = {name: getattr(db_word, name) for name in _REVIEW_FIELDS}
+        [values] = srs.apply_answers([row], [was_correct], [datetime.datetime.utcnow()], settings.srs_algorithm, _srs_params)
+        return await crud.save_word_review(db, db_word, values)
+
+    async def record_review_batch(self, db: AsyncSession, user_id: int, answers: list[schemas.ReviewAnswer]) -> list[dict]:
+        """
+        Applies a batch of review answers, recorded offline, in one transaction.
+
+        Answers are applied in the order they were answered (ties keep the
+        order given), each scheduled from its own answer date. Applying a batch is idempotent: an answer
+        no newer than the word's last applied review is skipped, so a client
+        can safely resend a batch after a network failure.
+
+        Returns one {"word_id", "answered_at", "status"} dict per answer, in
+        the order given, with status "applied", "skipped" or "not_found".
+        """
+        now = datetime.datetime.utcnow()
+        states = await crud.get_review_states(db, user_id=user_id, word_ids=list({a.word_id for a in answers}))
+
+        statuses = [None] * len(answers)
+        # Answers are scheduled in vectorized rounds; a word answered several
+        # times gets one answer per round, so each builds on the one before.
+        rounds = []
+        latest = {word_id: state["last_reviewed_at"] for word_id, state in states.items()}
+        depth = {}
+        for index in sorted(range(len(answers)), key=lambda i: _as_utc(answers[i].answered_at)):
+            answer = answers[index]
+            # Clamp clock-skewed answers so they cannot push a review into the future.
+            answered_at = min(_as_utc(answer.answered_at), now)
+            state = states.get(answer.word_id)
+            if state is None:
+                status = "not_found"
+            elif latest[answer.word_id] is not None and answered_at <= latest[answer.word_id]:
+                status = "skipped"
+            else:
+                latest[answer.word_id] = answered_at
+                round_index = depth.get(answer.word_id, 0)
+                depth[answer.word_id] = round_index + 1
+                if round_index == len(rounds):
+                    rounds.append([])
+                rounds[round_index].append((answer.word_id, answer.was_correct, answered_at))
+                status = "applied"
+            statuses[index] = status
+
+        updates = {}
+        for batch in rounds:
+            rows = [updates.get(word_id) or states[word_id] for word_id, _, _ in batch]
+            for values in srs.apply_answers(
+                rows,
+                [was_correct for _, was_correct, _ in batch],
+                [answered_at for _, _, answered_at in batch],
+                settings.srs_algorithm,
+                _srs_params,
+            ):
+                updates[values["id"]] = values
+
+        await crud.bulk_update_word_reviews(db, list(updates.values()))
+        return [
+            {"word_id": answer.word_id, "answered_at": answer.answered_at, "status": status}
+            for answer, status in zip(answers, statuses)
+        ]
+
+    def reset(self, user_id: int):
+        """Forgets the user's cursor so the next word comes from the top of the queue."""
+        with self._lock:
+            self._cursors.pop(user_id, None)
+
+
+# One scheduler per worker. It holds only cursors; the queue itself is the database.
+scheduler = ReviewScheduler(
+    max_cursors=settings.review_cursor_cache_size,
+    cursor_ttl_seconds=settings.review_cursor_ttl_seconds,
+)
@@ -0,0 +1,500 @@
+"""
+Spaced-repetition scheduling engine.
+
+Every algorithm works on a whole batch of cards at once: the review state of
+N cards is held in a DeckState (one NumPy array per field), and one answer per
+card is applied in a single vectorized pass. This is what lets us reschedule a
+user's whole deck, or every deck, in one go when parameters change.
+
+Algorithms:
+    classic  The original rule: after a correct answer the next interval is
+             2 ** (8 - difficulty) days and the word gets easier; after a
+             wrong one it comes back tomorrow and gets harder.
+    sm2      SuperMemo 2, with correct answers graded 4 and wrong ones 1.
+    fsrs     FSRS-style: tracks memory stability and schedules the next review
+             for when recall probability drops to the desired retention.
+
+Run as a script to reschedule stored decks:
+
+    python srs.py --algorithm fsrs --user-id 42
+    python srs.py --algorithm fsrs --all-users --desired-retention 0.85
+"""
+import argparse
+import datetime
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+# Default FSRS-4.5 weights.
+FSRS_DEFAULT_WEIGHTS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031,
+    1.6474, 0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 10
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+# Weight (in reviews) of the prior accuracy when simulating a card's answers.
+ACCURACY_PRIOR_WEIGHT = 5
+# Weight (in reviews) of prior_accuracy against the deck's own record.
+DECK_PRIOR_WEIGHT = 20
+
+# Word columns that hold review state, in addition to id and last_reviewed_at.
+STATE_COLUMNS = ("difficulty", "interval_days", "ease_factor", "repetitions", "stability", "reviews", "lapses")
+
+# The state each algorithm actually reads when scheduling. Forecasts group
+# words on these, so words that schedule alike are simulated together.
+SIMULATION_COLUMNS = {
+    "classic": ("difficulty",),
+    "sm2": ("interval_days", "ease_factor", "repetitions"),
+    "fsrs": ("difficulty", "stability", "last_reviewed_at"),
+}
+
+
+@dataclass(frozen=True)
+class SRSParams:
+    # Upper bound on any interval, in days.
+    max_interval_days: int = 36500
+    # Target recall probability at the time of the next review (fsrs).
+    desired_retention: float = 0.9
+    fsrs_weights: tuple = field(default=FSRS_DEFAULT_WEIGHTS)
+
+
+@dataclass
+class DeckState:
+    """
+    The review state of a batch of cards, one array per field. Index i of
+    every array describes the same card.
+    """
+    difficulty: np.ndarray    # int, 1 (easy) .. 10 (hard)
+    interval_days: np.ndarray # int, the last scheduled interval
+    ease_factor: np.ndarray   # float, SM-2 ease factor
+    repetitions: np.ndarray   # int, consecutive correct answers
+    stability: np.ndarray     # float, FSRS memory stability in days (NaN until first review)
+    reviews: np.ndarray       # int, total answers
+    lapses: np.ndarray        # int, wrong answers
+    elapsed_days: np.ndarray  # float, days since the previous review (0 for new cards)
+
+    def __len__(self):
+        return len(self.difficulty)
+
+    def take(self, index: np.ndarray) -> "DeckState":
+        """Returns the state of the cards at `index`."""
+        return DeckState(**{f.name: getattr(self, f.name)[index] for f in fields(self)})
+
+    def put(self, index: np.ndarray, other: "DeckState"):
+        """Overwrites the cards at `index` with `other`, in place."""
+        for f in fields(self):
+            getattr(self, f.name)[index] = getattr(other, f.name)
+
+    @classmethod
+    def concat(cls, *states: "DeckState") -> "DeckState":
+        """Joins several decks into one, in order."""
+        return cls(**{f.name: np.concatenate([getattr(state, f.name) for state in states]) for f in fields(cls)})
+
+    def tile(self, copies: int) -> "DeckState":
+        """Returns `copies` independent copies of the deck, one after another."""
+        return DeckState(**{f.name: np.tile(getattr(self, f.name), copies) for f in fields(self)})
+
+    @classmethod
+    def from_rows(cls, rows, review_dates: np.ndarray) -> "DeckState":
+        """
+        Builds a DeckState from database rows (mappings with the
+        STATE_COLUMNS and last_reviewed_at, a datetime or a date). Missing
+        or NULL values take the defaults of a brand new card. `review_dates` (datetime64[D])
+        is when each card is being reviewed, to compute elapsed time.
+        """
+        def column(name, default, dtype):
+            return np.array([default if row.get(name) is None else row[name] for row in rows], dtype=dtype)
+
+        last_reviewed = np.array(
+            [np.datetime64(row["last_reviewed_at"], "D") if row.get("last_reviewed_at") is not None else "NaT" for row in rows],
+            dtype="datetime64[D]",
+        )
+        elapsed = (review_dates - last_reviewed).astype("float64")
+        return cls(
+            difficulty=column("difficulty", MIN_DIFFICULTY, np.int64),
+            interval_days=column("interval_days", 0, np.int64),
+            ease_factor=column("ease_factor", INITIAL_EASE, np.float64),
+            repetitions=column("repetitions", 0, np.int64),
+            stability=column("stability", np.nan, np.float64),
+            reviews=column("reviews", 0, np.int64),
+            lapses=column("lapses", 0, np.int64),
+            elapsed_days=np.where(np.isnan(elapsed), 0.0, np.maximum(elapsed, 0.0)),
+        )
+
+
+def _counters(state: DeckState, correct: np.ndarray) -> dict:
+    """Bookkeeping shared by every algorithm."""
+    return dict(
+        repetitions=np.where(correct, state.repetitions + 1, 0),
+        reviews=state.reviews + 1,
+        lapses=state.lapses + (~correct),
+        elapsed_days=np.zeros(len(state)),
+    )
+
+
+def _step_difficulty(difficulty: np.ndarray, correct: np.ndarray) -> np.ndarray:
+    # Correct answers make a word easier, wrong ones harder.
+    return np.clip(np.where(correct, difficulty - 1, difficulty + 1), MIN_DIFFICULTY, MAX_DIFFICULTY)
+
+
+# --- Algorithms ---
+# Each takes (state, correct, params) and returns (new_state, interval_days).
+
+def classic_review(state: DeckState, correct: np.ndarray, params: SRSParams):
+    # Difficulty acts as a multiplier. More difficult words get reviewed sooner.
+    # (For difficulty 9 and 10 this is under a day; review() rounds it up to one.)
+    interval = np.where(correct, np.floor(2.0 ** (8 - state.difficulty)), 1).astype(np.int64)
+    new_state = DeckState(
+        difficulty=_step_difficulty(state.difficulty, correct),
+        interval_days=interval,
+        ease_factor=state.ease_factor,
+        stability=state.stability,
+        **_counters(state, correct),
+    )
+    return new_state, interval
+
+
+def sm2_review(state: DeckState, correct: np.ndarray, params: SRSParams):
+    quality = np.where(correct, 4, 1)
+    interval = np.where(
+        correct,
+        np.select(
+            [state.repetitions == 0, state.repetitions == 1],
+            [1, 6],
+            np.rint(np.maximum(state.interval_days, 1) * state.ease_factor),
+        ),
+        1,
+    ).astype(np.int64)
+    ease = state.ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    new_state = DeckState(
+        difficulty=_step_difficulty(state.difficulty, correct),
+        interval_days=interval,
+        ease_factor=np.maximum(ease, MIN_EASE),
+        stability=state.stability,
+        **_counters(state, correct),
+    )
+    return new_state, interval
+
+
+def _fsrs_interval(stability: np.ndarray, params: SRSParams) -> np.ndarray:
+    # Days until recall probability (1 + t / (9 S)) ** -1 falls to the desired retention.
+    return np.rint(stability * 9 * (1 / params.desired_retention - 1)).astype(np.int64)
+
+
+def fsrs_review(state: DeckState, correct: np.ndarray, params: SRSParams):
+    w = params.fsrs_weights
+    grade = np.where(correct, 3, 1)  # "Good" or "Again"
+    is_new = np.isnan(state.stability) | (state.reviews == 0)
+
+    # First review: stability and difficulty come straight from the grade.
+    initial_stability = np.where(correct, w[2], w[0])
+    initial_difficulty = w[4] - (grade - 3) * w[5]
+
+    # Later reviews: depend on how much was forgotten since the last one.
+    stability = np.where(is_new, 1.0, state.stability)
+    difficulty = state.difficulty.astype(np.float64)
+    retrievability = 1 / (1 + state.elapsed_days / (9 * stability))
+    success_stability = stability * (
+        1 + np.exp(w[8]) * (11 - difficulty) * stability ** -w[9] * (np.exp(w[10] * (1 - retrievability)) - 1)
+    )
+    failure_stability = np.minimum(
+        w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * np.exp(w[14] * (1 - retrievability)),
+        stability,
+    )
+    next_difficulty = difficulty - w[6] * (grade - 3)
+    # Mean reversion towards the difficulty of a fresh "Good" card.
+    next_difficulty = w[7] * w[4] + (1 - w[7]) * next_difficulty
+
+    new_stability = np.where(is_new, initial_stability, np.where(correct, success_stability, failure_stability))
+    new_difficulty = np.where(is_new, initial_difficulty, next_difficulty)
+    interval = np.maximum(_fsrs_interval(new_stability, params), 1)
+    new_state = DeckState(
+        difficulty=np.clip(np.rint(new_difficulty), MIN_DIFFICULTY, MAX_DIFFICULTY).astype(np.int64),
+        interval_days=interval,
+        ease_factor=state.ease_factor,
+        stability=new_stability,
+        **_counters(state, correct),
+    )
+    return new_state, interval
+
+
+ALGORITHMS = {
+    "classic": classic_review,
+    "sm2": sm2_review,
+    "fsrs": fsrs_review,
+}
+
+
+def review(algorithm: str, state: DeckState, correct: np.ndarray, params: SRSParams = SRSParams()):
+    """
+    Applies one answer per card. Returns (new_state, interval_days), with
+    intervals clipped to [1, params.max_interval_days].
+    """
+    new_state, interval = ALGORITHMS[algorithm](state, np.asarray(correct, dtype=bool), params)
+    interval = np.clip(interval, 1, params.max_interval_days)
+    new_state.interval_days = interval
+    return new_state, interval
+
+
+def reschedule_intervals(algorithm: str, state: DeckState, params: SRSParams = SRSParams()) -> np.ndarray:
+    """
+    Recomputes each card's current interval under (possibly new) parameters,
+    without applying an answer. fsrs derives it from stability and the
+    desired retention; classic and sm2 keep the stored interval, subject to
+    the new maximum.
+    """
+    if algorithm == "fsrs":
+        has_stability = ~np.isnan(state.stability)
+        interval = np.where(
+            has_stability, _fsrs_interval(np.where(has_stability, state.stability, 1.0), params), state.interval_days
+        )
+    else:
+        interval = state.interval_days
+    return np.clip(interval, 1, params.max_interval_days)
+
+
+def apply_answers(rows, correct, reviewed_at, algorithm: str, params: SRSParams = SRSParams()) -> list[dict]:
+    """
+    Reviews a batch of stored words, one answer each, and returns the column
+    values to write back: a dict per word with "id", the STATE_COLUMNS,
+    "next_review_due" and "last_reviewed_at".
+
+    `rows` are mappings with "id", the STATE_COLUMNS and "last_reviewed_at";
+    `reviewed_at` holds the (naive UTC) answer time of each.
+    """
+    review_dates = np.array([moment.date() for moment in reviewed_at], dtype="datetime64[D]")
+    state = DeckState.from_rows(rows, review_dates)
+    new_state, interval = review(algorithm, state, correct, params)
+    next_due = (review_dates + interval.astype("timedelta64[D]")).astype(object)
+    return [
+        {
+            "id": row["id"],
+            "difficulty": int(new_state.difficulty[i]),
+            "interval_days": int(new_state.interval_days[i]),
+            "ease_factor": float(new_state.ease_factor[i]),
+            "repetitions": int(new_state.repetitions[i]),
+            "stability": None if np.isnan(new_state.stability[i]) else float(new_state.stability[i]),
+            "reviews": int(new_state.reviews[i]),
+            "lapses": int(new_state.lapses[i]),
+            "next_review_due": next_due[i],
+            "last_reviewed_at": reviewed_at[i],
+        }
+        for i, row in enumerate(rows)
+    ]
+
+
+def reschedule_rows(rows, algorithm: str, params: SRSParams = SRSParams()) -> list[dict]:
+    """
+    Recomputes next_review_due for stored words that have been reviewed at
+    least once, counting the new interval from their last review. Returns
+    update dicts with "id", "interval_days" and "next_review_due".
+    """
+    rows = [row for row in rows if row["last_reviewed_at"] is not None]
+    if not rows:
+        return []
+    review_dates = np.array([row["last_reviewed_at"].date() for row in rows], dtype="datetime64[D]")
+    state = DeckState.from_rows(rows, review_dates)
+    interval = reschedule_intervals(algorithm, state, params)
+    next_due = (review_dates + interval.astype("timedelta64[D]")).astype(object)
+    return [
+        {"id": row["id"], "interval_days": int(interval[i]), "next_review_due": next_due[i]}
+        for i, row in enumerate(rows)
+    ]
+
+
+def simulate_workload(
+    state: DeckState,
+    due: np.ndarray,
+    accuracy: np.ndarray,
+    cards: np.ndarray,
+    days: int,
+    runs: int,
+    algorithm: str,
+    params: SRSParams = SRSParams(),
+    seed: int | None = None,
+) -> np.ndarray:
+    """
+    Monte-Carlo projection of a deck's review load over the next `days`
+    days, counting the re-reviews that the answers themselves cause.
+
+    The deck is given as groups of identical cards: `cards[i]` cards in
+    state i, due on day `due[i]` relative to today (overdue cards at 0),
+    reviewed `state.elapsed_days[i]` days ago and answered correctly with
+    probability `accuracy[i]`.
+
+    Cards are independent, so rather than stepping day by day, every group
+    still inside the horizon gets its next review in one vectorized pass
+    (a wave). A binomial draw splits each group into the cards answered
+    correctly and the rest, and groups that leave the horizon are dropped.
+    All runs are simulated side by side. Returns a (runs, days) array of
+    review counts.
+    """
+    counts = np.zeros(runs * days, dtype=np.int64)
+    in_horizon = np.flatnonzero(due < days)
+    state = state.take(in_horizon).tile(runs)
+    due = np.tile(due[in_horizon], runs)
+    accuracy = np.tile(accuracy[in_horizon], runs)
+    cards = np.tile(cards[in_horizon], runs)
+    run = np.repeat(np.arange(runs), len(in_horizon))
+    last_review = -state.elapsed_days  # day of each group's last review, relative to today
+    rng = np.random.default_rng(seed)
+
+    while len(due):
+        counts += np.bincount(run * days + due, weights=cards, minlength=runs * days).astype(np.int64)
+        state.elapsed_days = due - last_review
+        correct = rng.binomial(cards, accuracy)
+        passed, passed_interval = review(algorithm, state, np.ones(len(due), dtype=bool), params)
+        failed, failed_interval = review(algorithm, state, np.zeros(len(due), dtype=bool), params)
+
+        state = DeckState.concat(passed, failed)
+        cards = np.concatenate([correct, cards - correct])
+        last_review = np.concatenate([due, due])
+        due = np.concatenate([due + passed_interval, due + failed_interval])
+        accuracy = np.concatenate([accuracy, accuracy])
+        run = np.concatenate([run, run])
+
+        keep = np.flatnonzero((cards > 0) & (due < days))
+        state, cards, last_review, due, accuracy, run = (
+            state.take(keep), cards[keep], last_review[keep], due[keep], accuracy[keep], run[keep]
+        )
+
+        # Merge groups that answers have brought back into the same state,
+        # so the number of groups stays bounded by the number of distinct states.
+        keys = [run, due, accuracy] + [
+            last_review if name == "last_reviewed_at" else np.nan_to_num(getattr(state, name), nan=-1.0)
+            for name in SIMULATION_COLUMNS[algorithm]
+        ]
+        order = np.lexsort(keys)
+        sorted_keys = [key[order] for key in keys]
+        is_start = np.ones(len(order), dtype=bool)
+        is_start[1:] = np.any([key[1:] != key[:-1] for key in sorted_keys], axis=0)
+        starts = np.flatnonzero(is_start)
+        first = order[starts]
+        cards = np.add.reduceat(cards[order], starts) if len(starts) else cards
+        state, last_review, due, accuracy, run = (
+            state.take(first), last_review[first], due[first], accuracy[first], run[first]
+        )
+    return counts.reshape(runs, days)
+
+
+def forecast_workload(
+    groups,
+    today: datetime.date,
+    days: int,
+    runs: int,
+    algorithm: str,
+    params: SRSParams = SRSParams(),
+    prior_accuracy: float = 0.85,
+) -> list[dict]:
+    """
+    Simulates the review load of a deck given as groups of words in the
+    same state, as returned by crud.get_review_state_groups: mappings with
+    "cards", "next_review_due", the algorithm's SIMULATION_COLUMNS, and
+    "reviews" and "lapses" summed over the group.
+
+    Each word is answered correctly with its group's historical accuracy,
+    smoothed towards the deck's overall accuracy while it has few reviews.
+    The deck's accuracy is in turn smoothed towards `prior_accuracy` while
+    the deck has few reviews, so a handful of lapses cannot drive it to 0.
+
+    Returns one dict per day with the mean ("expected"), 10th ("low") and
+    90th ("high") percentile review count.
+    """
+    if not groups:
+        return [{"expected": 0.0, "low": 0.0, "high": 0.0} for _ in range(days)]
+
+    cards = np.array([group["cards"] for group in groups], dtype=np.int64)
+    reviews = np.array([group["reviews"] or 0 for group in groups], dtype=np.float64)
+    lapses = np.array([group["lapses"] or 0 for group in groups], dtype=np.float64)
+    # The deck's accuracy, itself smoothed towards prior_accuracy while the deck has few reviews.
+    deck_accuracy = (reviews.sum() - lapses.sum() + DECK_PRIOR_WEIGHT * prior_accuracy) / (
+        reviews.sum() + DECK_PRIOR_WEIGHT
+    )
+    # Beta-smoothed accuracy: a word needs a few reviews before its own record dominates.
+    accuracy = (reviews - lapses + ACCURACY_PRIOR_WEIGHT * deck_accuracy * cards) / (
+        reviews + ACCURACY_PRIOR_WEIGHT * cards
+    )
+
+    # Per-word averages stand in for the group's review counters.
+    rows = [
+        dict(group, reviews=round(reviews[i] / cards[i]), lapses=round(lapses[i] / cards[i]))
+        for i, group in enumerate(groups)
+    ]
+    origin = np.datetime64(today, "D")
+    state = DeckState.from_rows(rows, np.full(len(rows), origin))
+    due = np.array([group["next_review_due"] for group in groups], dtype="datetime64[D]")
+    due = np.maximum((due - origin).astype(np.int64), 0)
+
+    counts = simulate_workload(state, due, accuracy, cards, days, runs, algorithm, params)
+    expected = counts.mean(axis=0)
+    low, high = np.percentile(counts, [10, 90], axis=0)
+    return [
+        {"expected": float(expected[day]), "low": float(low[day]), "high": float(high[day])}
+        for day in range(days)
+    ]
+
+
+def params_from_settings(settings) -> SRSParams:
+    return SRSParams(
+        max_interval_days=settings.srs_max_interval_days,
+        desired_retention=settings.srs_desired_retention,
+    )
+
+
+def reschedule_decks(algorithm: str, params: SRSParams, user_id: int | None = None, chunk_size: int = 10_000) -> int:
+    """
+    Reschedules one user's deck (or every deck, if user_id is None) in
+    chunks of `chunk_size` words, each read with a keyset query, processed
+    in one vectorized pass and written with one executemany UPDATE.
+    Returns the number of words rescheduled.
+    """
+    from sqlalchemy import select, update
+
+    import models
+    from database import SessionLocal
+
+    columns = [models.Word.id, models.Word.last_reviewed_at] + [getattr(models.Word, name) for name in STATE_COLUMNS]
+    total = 0
+    last_id = 0
+    with SessionLocal() as db:
+        while True:
+            query = select(*columns).where(models.Word.id > last_id)
+            if user_id is not None:
+                query = query.where(models.Word.owner_id == user_id)
+            rows = db.execute(query.order_by(models.Word.id).limit(chunk_size)).mappings().all()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            updates = reschedule_rows(rows, algorithm, params)
+            if updates:
+                db.execute(update(models.Word), updates)
+                db.commit()
+            total += len(updates)
+    return total
+
+
+def main():
+    from config import settings
+
+    parser = argparse.ArgumentParser(description="Reschedule stored decks with the given SRS parameters.")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default=settings.srs_algorithm)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=int)
+    target.add_argument("--all-users", action="store_true")
+    parser.add_argument("--desired-retention", type=float, default=settings.srs_desired_retention)
+    parser.add_argument("--max-interval-days", type=int, default=settings.srs_max_interval_days)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    params = SRSParams(max_interval_days=args.max_interval_days, desired_retention=args.desired_retention)
+    start = datetime.datetime.now()
+    count = reschedule_decks(args.algorithm, params, user_id=args.user_id, chunk_size=args.chunk_size)
+    print(f"Rescheduled {count} words in {(datetime.datetime.now() - start).total_seconds():.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Local word-embedding index for vocabulary suggestions.
+
+data/words.txt is a frequency-ranked English word list and
+data/word_vectors.npy holds one unit-length embedding per word (same order).
+Suggestions are the words closest to the centroid of everything the user
+already knows, found with a single matrix-vector product over the
+memory-mapped matrix, so no Gemini call is needed.
+
+The vectors are built offline, once:
+
+    python word_index.py
+
+which embeds the word list with the Gemini embedding API (needs
+GOOGLE_API_KEY). Until the file exists, suggestions fall back to Gemini.
+"""
+import argparse
+import os
+import threading
+import time
+from typing import Iterable
+
+import numpy as np
+from cachetools import TTLCache
+
+from config import settings
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+WORDS_PATH = os.path.join(DATA_DIR, "words.txt")
+VECTORS_PATH = os.path.join(DATA_DIR, "word_vectors.npy")
+
+
+class WordEmbeddingIndex:
+    """
+    Nearest-neighbour search over the bundled word list. The matrix is opened
+    with mmap_mode="r" on first use, so every Gunicorn worker shares the same
+    page cache instead of holding its own copy.
+    """
+    def __init__(self, words_path: str, vectors_path: str, skip_common: int, candidates: int):
+        self.words_path = words_path
+        self.vectors_path = vectors_path
+        # The most frequent words are too basic to be worth suggesting.
+        self.skip_common = skip_common
+        # Suggestions are drawn from this many best matches, so repeated
+        # requests do not always return the same handful of words.
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._words: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._vectors: np.ndarray | None = None
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self.vectors_path):
+                print(f"Word index not found at {self.vectors_path}; suggestions will use Gemini.")
+                return
+            with open(self.words_path) as f:
+                words = [line.strip() for line in f if line.strip()]
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+            if vectors.ndim != 2 or len(vectors) != len(words):
+                print(f"Word index {self.vectors_path} does not match {self.words_path}; ignoring it.")
+                return
+            self._words = words
+            self._rows = {word: row for row, word in enumerate(words)}
+            self._vectors = vectors
+
+    @property
+    def available(self) -> bool:
+        self._load()
+        return self._vectors is not None
+
+    def rows(self, words: Iterable[str]) -> np.ndarray:
+        """
+        The rows of those of `words` that are in the index. The words must
+        already be lower-cased and trimmed. Empty if the index is not available.
+        """
+        self._load()
+        return np.fromiter((row for row in map(self._rows.get, words) if row is not None), dtype=np.int32)
+
+    def suggest(self, known_words: Iterable[str], limit: int, rng: np.random.Generator | None = None) -> list[str]:
+        """suggest_near() for the rows of `known_words` (lower-cased and trimmed)."""
+        return self.suggest_near(self.rows(known_words), limit, rng)
+
+    def suggest_near(self, known_rows: np.ndarray, limit: int, rng: np.random.Generator | None = None) -> list[str]:
+        """
+        Returns up to `limit` words the user does not know yet, closest to the
+        centroid of the known words, given as rows of the index (see rows()).
+        For a user with no such words, picks among the most common words
+        worth learning. Returns an empty list if the index is not available.
+        """
+        if not self.available:
+            return []
+        rng = rng or np.random.default_rng()
+
+        if len(known_rows):
+            # A 0/1 mask times the matrix sums the known vectors without
+            # gathering their rows; scaling does not change the ranking.
+            known = np.zeros(len(self._words), dtype=np.float32)
+            known[known_rows] = 1.0
+            scores = self._vectors @ (known @ self._vectors)
+        else:
+            # Nothing to go on: prefer frequent words, i.e. earlier rows.
+            scores = -np.arange(len(self._words), dtype=np.float32)
+        scores[:self.skip_common] = -np.inf
+        scores[known_rows] = -np.inf
+
+        count = min(self.candidates, len(scores) - 1)
+        best = np.argpartition(-scores, count)[:count]
+        best = best[np.isfinite(scores[best])]
+        picked = rng.choice(best, size=min(limit, len(best)), replace=False)
+        return [self._words[row] for row in picked[np.argsort(-scores[picked])]]
+
+
+def build_index(words_path: str = WORDS_PATH, vectors_path: str = VECTORS_PATH, model: str = "models/text-embedding-004",
+                dimensions: int = 256, batch_size: int = 100):
+    """
+    Embeds every word of the word list with the Gemini embedding API and
+    writes the unit-length vectors to `vectors_path`, one row per word.
+    """
+    import google.generativeai as genai
+
+    genai.configure(api_key=settings.google_api_key)
+    with open(words_path) as f:
+        words = [line.strip() for line in f if line.strip()]
+
+    partial_path = vectors_path + ".partial"
+    vectors = np.lib.format.open_memmap(partial_path, mode="w+", dtype=np.float32, shape=(len(words), dimensions))
+    for start in range(0, len(words), batch_size):
+        batch = words[start:start + batch_size]
+        for attempt in range(5):
+            try:
+                result = genai.embed_content(
+                    model=model, content=batch, task_type="SEMANTIC_SIMILARITY", output_dimensionality=dimensions
+                )
+                break
+            except Exception as e:
+                print(f"Embedding batch at {start} failed ({e}); retrying.")
+                time.sleep(2 ** attempt)
+        else:
+            raise RuntimeError(f"Could not embed the batch starting at word {start}.")
+        embeddings = np.asarray(result["embedding"], dtype=np.float32)
+        vectors[start:start + len(batch)] = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        print(f"Embedded {start + len(batch)}/{len(words)} words")
+    vectors.flush()
+    del vectors
+    os.replace(partial_path, vectors_path)
+
+
+class KnownRowsCache:
+    """
+    Per-user index rows of the words each user knows, for this worker, each
+    with the highest word id they cover. As with word_search.TrigramIndexCache,
+    words are never renamed or deleted, so a cached entry only ever needs the
+    rows of the words added after that id appended to it.
+    """
+    def __init__(self, max_users: int, ttl_seconds: int):
+        self._rows = TTLCache(maxsize=max_users, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> tuple[int | None, np.ndarray] | None:
+        """Returns (max_word_id, rows) for the user, or None."""
+        with self._lock:
+            return self._rows.get(user_id)
+
+    def put(self, user_id: int, max_word_id: int | None, rows: np.ndarray):
+        with self._lock:
+            self._rows[user_id] = (max_word_id, rows)
+
+
+# One index per worker process; the memory-mapped matrix is shared through the page cache.
+index = WordEmbeddingIndex(
+    WORDS_PATH,
+    VECTORS_PATH,
+    skip_common=settings.word_index_skip_common,
+    candidates=settings.word_index_candidates,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the word-embedding index used for suggestions.")
+    parser.add_argument("--model", default="models/text-embedding-004")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    build_index(model=args.model, dimensions=args.dimensions, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
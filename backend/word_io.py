@@ -0,0 +1,153 @@
+import codecs
+import csv
+import datetime
+import io
+import json
+import zlib
+from typing import AsyncIterator, Iterable
+
+# Formats accepted by the bulk import endpoint, by media type.
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/jsonl", "application/json-lines"}
+CSV_MEDIA_TYPES = {"text/csv", "application/csv"}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int) -> AsyncIterator[str | None]:
+    """
+    Turns a stream of byte chunks into a stream of text lines, without ever
+    holding more than one chunk plus one partial line in memory.
+
+    A line longer than `max_length` characters is yielded as None; only its
+    first `max_length` characters are ever buffered.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    # Whether the rest of the current line is being dropped for being too long.
+    too_long = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if too_long or len(line) > max_length:
+                too_long = False
+                yield None
+            else:
+                yield line.rstrip("\r")
+        if len(pending) > max_length:
+            too_long, pending = True, ""
+    pending += decoder.decode(b"", final=True)
+    if too_long or len(pending) > max_length:
+        yield None
+    elif pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_ndjson_records(
+    chunks: AsyncIterator[bytes], max_length: int
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Parses newline-delimited JSON incrementally.
+    Yields (row_number, record, error) tuples; blank lines are skipped, and
+    lines longer than `max_length` characters are invalid rows.
+    """
+    row = 0
+    async for line in iter_lines(chunks, max_length):
+        if line is None:
+            row += 1
+            yield row, None, f"Line is longer than {max_length} characters"
+            continue
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Each line must be a JSON object"
+            continue
+        yield row, record, None
+
+
+async def iter_csv_records(
+    chunks: AsyncIterator[bytes], max_length: int
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Parses CSV with a header row incrementally.
+    Yields (row_number, record, error) tuples; blank lines are skipped.
+
+    A quoted field may contain newlines, so physical lines are joined until
+    the quotes balance before a record is handed to the csv module. A record
+    longer than `max_length` characters ends the parse with an invalid row,
+    since where the next record starts can no longer be told.
+    """
+    header = None
+    row = 0
+    record_lines = []
+    length = quotes = 0
+    async for line in iter_lines(chunks, max_length):
+        if line is not None:
+            # Counted as joined below, with a newline between lines.
+            length += len(line) + bool(record_lines)
+            record_lines.append(line)
+            quotes += line.count('"')
+        if line is None or length > max_length:
+            yield row + 1, None, f"Record is longer than {max_length} characters; the rest of the file was not read"
+            return
+        if quotes % 2:
+            continue
+        text = "\n".join(record_lines)
+        record_lines, length, quotes = [], 0, 0
+        if not text.strip():
+            continue
+
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = [field.strip().lower() for field in fields]
+            continue
+        row += 1
+        if len(fields) != len(header):
+            yield row, None, f"Expected {len(header)} fields, got {len(fields)}"
+            continue
+        yield row, dict(zip(header, fields)), None
+
+    if record_lines:
+        yield row + 1, None, "Unterminated quoted field at end of input"
+
+
+# --- Export ---
+EXPORT_FIELDS = ["id", "text", "definition", "difficulty", "next_review_due", "updated_at"]
+
+
+def _export_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def format_ndjson(rows: Iterable[tuple]) -> str:
+    """Formats rows (in EXPORT_FIELDS order) as newline-delimited JSON."""
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, map(_export_value, row)))) + "\n"
+        for row in rows
+    )
+
+
+def format_csv(rows: Iterable[tuple], header: bool = False) -> str:
+    """Formats rows (in EXPORT_FIELDS order) as CSV, optionally with the header row first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_export_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def gzip_stream(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Compresses a stream of text chunks into a gzip stream, on the fly."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
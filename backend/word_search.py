@@ -0,0 +1,197 @@
+"""
+Normalized word text and typo-tolerant word search.
+
+Every word stores a normalized_text (see normalize_text), which is unique
+per user and drives both duplicate detection and search. Prefix search is a
+range scan over the (owner_id, normalized_text) index. Typo-tolerant search
+ranks words by trigram similarity: on PostgreSQL with pg_trgm, elsewhere
+with the in-process TrigramIndex below.
+
+Databases created before normalized_text existed get the column added and
+filled in by migrate.py (see backfill_normalized_text).
+"""
+import threading
+import unicodedata
+
+import numpy as np
+from cachetools import TTLCache
+
+# Words whose trigram similarity to the query is below this are not typo matches
+# (the same default as pg_trgm.similarity_threshold).
+SIMILARITY_THRESHOLD = 0.3
+
+
+def normalize_text(text: str) -> str:
+    """
+    Folds a word to the form used for uniqueness and search: accents
+    stripped, case-folded and whitespace collapsed, so "Café ", "cafe" and
+    "CAFÉ" are the same word.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def _trigram_codes(texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Extracts the distinct trigrams of each text, padded the way pg_trgm pads
+    words ("  word "), so both backends rank alike. Each trigram is packed
+    into one integer (three 21-bit code points). Returns (codes, owners)
+    sorted by code, where owners[i] is the position in `texts` that
+    codes[i] came from.
+    """
+    pieces = []
+    piece_owners = []
+    for position, text in enumerate(texts):
+        for word in text.split():
+            pieces.append(f"  {word} ")
+            piece_owners.append(position)
+    if not pieces:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+
+    chars = np.frombuffer("".join(pieces).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    piece_of_char = np.repeat(np.arange(len(pieces)), [len(piece) for piece in pieces])
+    start = np.arange(len(chars) - 2)
+    # A trigram must not straddle two padded words.
+    start = start[piece_of_char[start] == piece_of_char[start + 2]]
+    codes = (chars[start] << np.uint64(42)) | (chars[start + 1] << np.uint64(21)) | chars[start + 2]
+    owners = np.asarray(piece_owners, dtype=np.int64)[piece_of_char[start]]
+
+    # Count each trigram once per text.
+    order = np.lexsort((owners, codes))
+    codes, owners = codes[order], owners[order]
+    distinct = np.ones(len(codes), dtype=bool)
+    distinct[1:] = (codes[1:] != codes[:-1]) | (owners[1:] != owners[:-1])
+    return codes[distinct], owners[distinct]
+
+
+class TrigramIndex:
+    """
+    An inverted index from trigram to word, over one user's words: the
+    (trigram, word position) pairs sorted by trigram, so each trigram's
+    posting list is one contiguous slice found by binary search. A query
+    counts its shared trigrams with every candidate in one bincount and
+    scores them the way pg_trgm's similarity() does:
+    shared / (query trigrams + word trigrams - shared).
+    """
+    def __init__(self, ids: list[int], texts: list[str]):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.codes = np.zeros(0, dtype=np.uint64)
+        self.positions = np.zeros(0, dtype=np.int64)
+        self.add(ids, texts)
+
+    def add(self, ids: list[int], texts: list[str]):
+        """Adds words to the index, merging their trigrams into the sorted arrays."""
+        codes, owners = _trigram_codes(texts)
+        owners += len(self.ids)
+        at = np.searchsorted(self.codes, codes, side="right")
+        self.codes = np.insert(self.codes, at, codes)
+        self.positions = np.insert(self.positions, at, owners)
+        self.sizes = np.concatenate([self.sizes, np.bincount(owners - len(self.ids), minlength=len(ids))])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+
+    def search(self, query: str, limit: int, threshold: float = SIMILARITY_THRESHOLD) -> list[tuple[int, float]]:
+        """Returns up to `limit` (word_id, similarity) pairs, best first."""
+        codes, _ = _trigram_codes([query])
+        if not len(codes) or not len(self.ids):
+            return []
+        lo = np.searchsorted(self.codes, codes, side="left")
+        hi = np.searchsorted(self.codes, codes, side="right")
+        shared = np.bincount(
+            np.concatenate([self.positions[start:end] for start, end in zip(lo, hi)]), minlength=len(self.ids)
+        )
+        candidates = np.flatnonzero(shared)
+        similarity = shared[candidates] / (len(codes) + self.sizes[candidates] - shared[candidates])
+        matches = similarity >= threshold
+        candidates, similarity = candidates[matches], similarity[matches]
+        best = np.argsort(-similarity, kind="stable")[:limit]
+        return [(int(self.ids[i]), float(s)) for i, s in zip(candidates[best], similarity[best])]
+
+
+class TrigramIndexCache:
+    """
+    Per-user TrigramIndex objects for this worker, each with the highest word
+    id it covers. Words are never renamed or deleted, so a cached index only
+    ever needs the words added after that id appended to it; comparing ids
+    is a single index lookup, and it also picks up words added through
+    other workers.
+    """
+    def __init__(self, max_users: int, ttl_seconds: int):
+        self._indexes = TTLCache(maxsize=max_users, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> tuple[int | None, TrigramIndex] | None:
+        """Returns (max_word_id, index) for the user, or None."""
+        with self._lock:
+            return self._indexes.get(user_id)
+
+    def put(self, user_id: int, max_word_id: int | None, index: TrigramIndex):
+        with self._lock:
+            self._indexes[user_id] = (max_word_id, index)
+
+
+def backfill_normalized_text(conn, batch_size: int = 5000) -> tuple[int, list[int]]:
+    """
+    Fills in normalized_text for the words that do not have it yet, in
+    batches, on an open connection. updated_at is kept as it is, so
+    incremental exports do not resend every word.
+
+    If the unique (owner_id, normalized_text) index already exists, a word
+    that would duplicate another is left without normalized_text. Returns
+    the number of words filled in and the ids of the words left out.
+    """
+    from sqlalchemy import bindparam, select, update
+    from sqlalchemy.exc import IntegrityError
+
+    import models
+
+    table = models.Word.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("word_id"))
+        .values(normalized_text=bindparam("normalized"), updated_at=table.c.updated_at)
+    )
+    filled = 0
+    left_out = []
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.text)
+            .where(table.c.normalized_text.is_(None), table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values = [{"word_id": row.id, "normalized": normalize_text(row.text or "")} for row in rows]
+        try:
+            with conn.begin_nested():
+                conn.execute(statement, values)
+            filled += len(values)
+        except IntegrityError:
+            # Some word duplicates another: retry one by one to find which.
+            for value in values:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(statement, [value])
+                    filled += 1
+                except IntegrityError:
+                    left_out.append(value["word_id"])
+    return filled, left_out
+
+
+def find_duplicate_words(conn) -> list[tuple[int, str, int]]:
+    """Lists (owner_id, normalized_text, count) for normalized texts a user has more than once."""
+    from sqlalchemy import func, select
+
+    import models
+
+    table = models.Word.__table__
+    return conn.execute(
+        select(table.c.owner_id, table.c.normalized_text, func.count())
+        .where(table.c.normalized_text.is_not(None))
+        .group_by(table.c.owner_id, table.c.normalized_text)
+        .having(func.count() > 1)
+    ).all()
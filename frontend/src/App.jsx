@@ -10,6 +10,7 @@ function App() {
       localStorage.setItem('token', token);
     } else {
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
     }
   }, [token]);
 
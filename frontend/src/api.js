@@ -19,4 +19,44 @@ apiClient.interceptors.request.use(
   }
 );
 
+// Each refresh token works only once, so requests that fail together share
+// one refresh instead of racing to use the same token.
+let pendingRefresh = null;
+
+const refreshTokens = (refreshToken) => {
+  if (!pendingRefresh) {
+    pendingRefresh = apiClient
+      .post('/token/refresh', { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refreshToken', response.data.refresh_token);
+      })
+      .finally(() => {
+        pendingRefresh = null;
+      });
+  }
+  return pendingRefresh;
+};
+
+// When an access token expires, exchange the stored refresh token for a new
+// pair once and retry the request, instead of sending the user back to login.
+apiClient.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (error.response?.status !== 401 || !refreshToken || original._retried || original.url === '/token/refresh') {
+      return Promise.reject(error);
+    }
+    original._retried = true;
+    try {
+      await refreshTokens(refreshToken);
+    } catch {
+      localStorage.removeItem('refreshToken');
+      return Promise.reject(error);
+    }
+    return apiClient(original);
+  }
+);
+
 export default apiClient;
\ No newline at end of file
@@ -25,6 +25,7 @@ function AuthPage({ setToken }) {
         formData.append('username', username);
         formData.append('password', password);
         const response = await apiClient.post('/token', formData);
+        localStorage.setItem('refreshToken', response.data.refresh_token);
         setToken(response.data.access_token);
       } else {
         await apiClient.post('/users/', { username, password });
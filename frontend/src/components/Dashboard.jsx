@@ -19,13 +19,17 @@ function Dashboard({ setToken }) {
   const [currentPage, setCurrentPage] = useState('dashboard');
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const [isLoadingWords, setIsLoadingWords] = useState(false);
+  // Cursor of the next page of words, or null once all of them are loaded.
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMoreWords, setIsLoadingMoreWords] = useState(false);
 
   // Your original working fetchWords function
   const fetchWords = async () => {
     try {
       setIsLoadingWords(true);
       const response = await apiClient.get('/words/');
-      setWords(response.data);
+      setWords(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       setError('Could not fetch words.');
     } finally {
@@ -33,6 +37,19 @@ function Dashboard({ setToken }) {
     }
   };
 
+  const fetchMoreWords = async () => {
+    try {
+      setIsLoadingMoreWords(true);
+      const response = await apiClient.get('/words/', { params: { cursor: nextCursor } });
+      setWords(previous => [...previous, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      setError('Could not fetch more words.');
+    } finally {
+      setIsLoadingMoreWords(false);
+    }
+  };
+
   // Your original useEffect
   useEffect(() => {
     if (!isReviewing) {
@@ -42,6 +59,11 @@ function Dashboard({ setToken }) {
 
   // Your original working handlers
   const handleLogout = () => {
+    // Revoke the refresh token so it cannot be used after logging out.
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      apiClient.post('/token/revoke', { refresh_token: refreshToken }).catch(() => {});
+    }
     setToken(null);
   };
 
@@ -243,7 +265,7 @@ function Dashboard({ setToken }) {
                     </div>
                     <span>My Word List</span>
                     <span className="text-sm bg-indigo-100 text-indigo-700 px-3 py-1 rounded-full font-medium">
-                      {words.length} {words.length === 1 ? 'word' : 'words'}
+                      {words.length}{nextCursor ? '+' : ''} {words.length === 1 && !nextCursor ? 'word' : 'words'}
                     </span>
                   </h2>
 
@@ -272,6 +294,15 @@ function Dashboard({ setToken }) {
                           </p>
                         </div>
                       ))}
+                      {nextCursor && (
+                        <button
+                          onClick={fetchMoreWords}
+                          disabled={isLoadingMoreWords}
+                          className="w-full py-4 rounded-2xl border border-indigo-200 text-indigo-600 font-semibold hover:bg-indigo-50 transition-all duration-200 disabled:opacity-50 disabled:cursor-not-allowed"
+                        >
+                          {isLoadingMoreWords ? 'Loading...' : 'Load more words'}
+                        </button>
+                      )}
                     </div>
                   ) : (
                     <div className="text-center py-16">